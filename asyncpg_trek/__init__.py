@@ -1,11 +1,56 @@
-from asyncpg_trek._backend import SupportsBackend
-from asyncpg_trek._run import execute, plan
-from asyncpg_trek._types import Direction, Operation
+from asyncpg_trek._backend import (
+    SupportsBackend,
+    SupportsDurations,
+    SupportsGovernor,
+    SupportsPhases,
+    SupportsPostExecute,
+    SupportsSettings,
+    SupportsSyntheticData,
+)
+from asyncpg_trek._harness import BudgetExceeded, LoadTestResult, load_test
+from asyncpg_trek._repository import MigrationRepository
+from asyncpg_trek._run import execute, get_migration_durations, plan, throttle
+from asyncpg_trek._tracks import Track, TracksResult, migrate_tracks
+from asyncpg_trek._types import (
+    Budget,
+    Direction,
+    ExecutionResult,
+    MigrationResult,
+    Operation,
+    Phase,
+)
+from asyncpg_trek._worker import (
+    MigrationWorkerError,
+    ProgressEvent,
+    migrate_in_subprocess,
+)
 
 __all__ = [
     "SupportsBackend",
+    "SupportsGovernor",
+    "SupportsPostExecute",
+    "SupportsSyntheticData",
+    "SupportsSettings",
+    "SupportsDurations",
+    "SupportsPhases",
+    "MigrationRepository",
     "plan",
     "execute",
+    "throttle",
+    "get_migration_durations",
+    "Track",
+    "TracksResult",
+    "migrate_tracks",
+    "load_test",
+    "LoadTestResult",
+    "Budget",
+    "BudgetExceeded",
+    "migrate_in_subprocess",
+    "ProgressEvent",
+    "MigrationWorkerError",
     "Direction",
+    "ExecutionResult",
+    "MigrationResult",
     "Operation",
+    "Phase",
 ]
@@ -1,11 +1,13 @@
 import pathlib
-from typing import AsyncContextManager, Optional, TypeVar
+from typing import AsyncContextManager, Mapping, Optional, Set, Tuple, TypeVar
 
+from asyncpg_trek._profile import StatementRecorder
 from asyncpg_trek._types import Operation
 from asyncpg_trek._typing import Protocol
 
 T = TypeVar("T")
 T_co = TypeVar("T_co", covariant=True)
+T_contra = TypeVar("T_contra", contravariant=True)
 
 
 class SupportsBackendExecutor(Protocol[T_co]):
@@ -48,3 +50,101 @@ class SupportsBackend(Protocol[T]):
         The operation will be passed to the `execute_operation` of SupportsBackendExecutor.
         """
         ...
+
+
+class SupportsSettings(Protocol):
+    """Optionally implemented by executors to support per-migration settings"""
+
+    def apply_settings(self, settings: Mapping[str, str]) -> AsyncContextManager[None]:
+        """Apply a migration's settings on top of any backend wide defaults
+        while the context is active, restoring the previous values on exit.
+        """
+        ...
+
+
+class SupportsPhases(Protocol):
+    """Optionally implemented by executors to keep a revision per phase.
+
+    Executors implementing it accept an optional `phase` in the methods of
+    SupportsBackendExecutor that read and record revisions.
+    """
+
+    async def get_current_revision(self, phase: Optional[str] = None) -> Optional[str]:
+        """Get the current revision, only considering migrations recorded
+        for `phase` or without a phase if one is given.
+        """
+        ...
+
+    async def record_migration(
+        self,
+        from_revision: Optional[str],
+        to_revision: Optional[str],
+        phase: Optional[str] = None,
+    ) -> None:
+        """Record a migration, only advancing the revision of `phase`
+        if one is given.
+        """
+        ...
+
+
+class SupportsDurations(Protocol):
+    """Optionally implemented by executors to remember how long migrations took"""
+
+    async def record_duration(self, seconds: float) -> None:
+        """Record how long the migration last passed to `record_migration` took"""
+        ...
+
+    async def get_durations(self) -> Mapping[Tuple[str, str], float]:
+        """Get the most recently recorded duration of each (from, to) revision
+        pair that has one.
+        """
+        ...
+
+
+class SupportsGovernor(Protocol[T_contra]):
+    async def throttle(self, connection: T_contra) -> float:
+        """Block until it is safe to keep writing to the database.
+
+        This is called before every migration and may also be called by
+        Python migrations between batches of work.
+        Returns the number of seconds spent waiting.
+        """
+        ...
+
+
+class SupportsProfiler(Protocol[T]):
+    def instrument(self, connection: T, recorder: StatementRecorder) -> T:
+        """Wrap a connection so that every statement issued through it
+        is reported to `recorder`.
+        """
+        ...
+
+
+class SupportsPostExecute(Protocol[T_contra]):
+    async def before_plan(self, connection: T_contra) -> None:
+        """Called in the migration transaction before the first migration"""
+        ...
+
+    async def after_plan(self, connection: T_contra) -> None:
+        """Called in the migration transaction after the last migration"""
+        ...
+
+    async def after_commit(self) -> None:
+        """Called once the migrations have been committed"""
+        ...
+
+
+class SupportsSyntheticData(Protocol[T_contra]):
+    async def populate(self, connection: T_contra, rows: int) -> Mapping[str, int]:
+        """Top up every table in the database to at least `rows` rows of
+        synthetic data, returning the number of rows in each table.
+        """
+        ...
+
+    def touched_tables(self, connection: T_contra) -> AsyncContextManager[Set[str]]:
+        """Collect the tables read or written by statements issued while
+        the context is active, named like the keys returned by `populate()`.
+
+        The set is complete once the context exits.
+        """
+        ...
@@ -1,17 +1,42 @@
 import pathlib
 import re
-from dataclasses import dataclass
-from importlib.machinery import SourceFileLoader
-from typing import Collection, Generic, List, TypeVar, cast
+from dataclasses import dataclass, replace
+from importlib.util import module_from_spec, spec_from_file_location
+from types import ModuleType
+from typing import (
+    Collection,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 from asyncpg_trek._backend import SupportsBackend
-from asyncpg_trek._types import INITIAL_REVISION, Direction, Migration, Operation
+from asyncpg_trek._types import (
+    INITIAL_REVISION,
+    Budget,
+    Direction,
+    Migration,
+    Operation,
+    Phase,
+)
 
 T = TypeVar("T")
 
 MIGRATION_FILE_PATT = re.compile(
     r"^(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})_(?P<from>\w+)_(?P<direction>(:?up)|(:?down))_(?P<to>\w+).(?P<format>(:?sql)|(:?py))$"
 )
+# directives in the leading comments of SQL files, e.g. "-- set: work_mem = 256MB"
+SQL_HEADER_DIRECTIVE_PATT = re.compile(r"^--\s*(?P<name>\w+)\s*:\s*(?P<value>.*?)\s*$")
+SETTING_PATT = re.compile(r"^(?P<name>[\w.]+)\s*=\s*(?P<value>.+?)\s*;?$")
+# "-- budget: 30s" or "-- budget: 50000 rows/s"
+BUDGET_PATT = re.compile(
+    r"^(?:(?P<seconds>[\d.]+)\s*s?|(?P<rows_per_second>[\d.]+)\s*rows\s*/\s*s)$"
+)
 
 
 @dataclass
@@ -20,43 +45,128 @@ class CollectedMigrations(Generic[T]):
     initial: Migration[T]
 
 
+def parse_sql_header(path: pathlib.Path) -> List[Tuple[str, str]]:
+    """Read (name, value) directives from the comments at the top of a SQL file"""
+    directives: List[Tuple[str, str]] = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("--"):
+                break
+            match = SQL_HEADER_DIRECTIVE_PATT.match(line)
+            if match:
+                directives.append((match.group("name").lower(), match.group("value")))
+    return directives
+
+
+def parse_setting(path: pathlib.Path, value: str) -> Tuple[str, str]:
+    match = SETTING_PATT.match(value)
+    if not match:
+        raise ValueError(f"Invalid setting {value!r} in {path}, expected name = value")
+    setting = match.group("value")
+    if len(setting) > 1 and setting[0] == setting[-1] and setting[0] in "'\"":
+        setting = setting[1:-1]
+    return match.group("name"), setting
+
+
+def load_module(path: pathlib.Path) -> ModuleType:
+    # always execute into a fresh module so that attributes of a previous
+    # version of the file, or of a file with the same name in another
+    # directory, can't leak into this one
+    spec = spec_from_file_location(path.stem, str(path.absolute()))
+    assert spec is not None and spec.loader is not None
+    mod = module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def parse_budget(path: pathlib.Path, value: str, budget: Optional[Budget]) -> Budget:
+    match = BUDGET_PATT.match(value)
+    if not match:
+        raise ValueError(
+            f"Invalid budget {value!r} in {path}, expected e.g. 30s or 1000 rows/s"
+        )
+    budget = budget or Budget()
+    if match.group("seconds"):
+        return replace(budget, seconds=float(match.group("seconds")))
+    return replace(budget, rows_per_second=float(match.group("rows_per_second")))
+
+
+def parse_phase(path: pathlib.Path, value: object) -> Phase:
+    if isinstance(value, Phase):
+        return value
+    try:
+        return Phase[str(value).strip().lower()]
+    except KeyError:
+        raise ValueError(
+            f"Invalid phase {value!r} in {path}, expected expand or contract"
+        ) from None
+
+
+def parse_migration_file(
+    path: pathlib.Path, backend: SupportsBackend[T]
+) -> Optional[Migration[T]]:
+    """Load a single migration file, returning None if the file name
+    does not follow the migration file naming convention.
+    """
+    match = MIGRATION_FILE_PATT.match(path.name)
+    if not match:
+        return None
+    format = match.group("format")
+    if match.group("direction") == "up":
+        direction = Direction.up
+    else:
+        direction = Direction.down
+    from_rev, to_rev = match.group("from"), match.group("to")
+    settings: Dict[str, str] = {}
+    budget: Optional[Budget] = None
+    phase: Optional[Phase] = None
+    if format == "py":
+        mod = load_module(path)
+        operation = cast(Operation[T], getattr(mod, "run_migration"))
+        settings.update(
+            (str(k), str(v)) for k, v in getattr(mod, "SETTINGS", {}).items()
+        )
+        budget = getattr(mod, "BUDGET", None)
+        if getattr(mod, "PHASE", None) is not None:
+            phase = parse_phase(path, getattr(mod, "PHASE"))
+    else:
+        operation = backend.prepare_operation_from_sql_file(path)
+        for name, value in parse_sql_header(path):
+            if name == "set":
+                settings.update([parse_setting(path, value)])
+            elif name == "budget":
+                budget = parse_budget(path, value, budget)
+            elif name == "phase":
+                phase = parse_phase(path, value)
+    return Migration(
+        operation=operation,
+        from_rev=from_rev,
+        to_rev=to_rev,
+        direction=direction,
+        path=path,
+        settings=settings,
+        budget=budget,
+        phase=phase,
+    )
+
+
+def check_has_initial_migration(migrations: Iterable[Migration[T]]) -> None:
+    if not any(mig.from_rev == INITIAL_REVISION for mig in migrations):
+        raise LookupError("Unable to locate initial migration")
+
+
 def collect_migrations_from_filesystem(
     revisions_folder: pathlib.Path, backend: SupportsBackend[T]
 ) -> Collection[Migration[T]]:
-    found_initial = False
     migrations: List[Migration[T]] = []
     for path in revisions_folder.iterdir():
         if not path.is_file():
             continue
-        match = MIGRATION_FILE_PATT.match(path.name)
-        if not match:
-            continue
-        format = match.group("format")
-        if match.group("direction") == "up":
-            direction = Direction.up
-        else:
-            direction = Direction.down
-        from_rev, to_rev = match.group("from"), match.group("to")
-        if format == "py":
-            mod = SourceFileLoader(path.stem, str(path.absolute())).load_module()
-            operation = cast(Operation[T], getattr(mod, "run_migration"))
-            mig = Migration(
-                operation=operation,
-                from_rev=from_rev,
-                to_rev=to_rev,
-                direction=direction,
-            )
-        else:
-            operation = backend.prepare_operation_from_sql_file(path)
-            mig = Migration(
-                operation=operation,
-                from_rev=from_rev,
-                to_rev=to_rev,
-                direction=direction,
-            )
-        if mig.from_rev == INITIAL_REVISION:
-            found_initial = True
-        migrations.append(mig)
-    if not found_initial:
-        raise LookupError("Unable to locate initial migration")
+        mig = parse_migration_file(path, backend)
+        if mig is not None:
+            migrations.append(mig)
+    check_has_initial_migration(migrations)
     return migrations
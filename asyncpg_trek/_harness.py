@@ -0,0 +1,110 @@
+import pathlib
+from dataclasses import dataclass, replace
+from logging import getLogger
+from typing import Generic, List, Mapping, Optional, Sequence, Set, TypeVar, Union
+
+from asyncpg_trek._backend import SupportsBackend, SupportsSyntheticData
+from asyncpg_trek._repository import MigrationRepository
+from asyncpg_trek._run import execute, plan
+from asyncpg_trek._types import Budget, Direction, Migration, Phase
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class LoadTestResult(Generic[T]):
+    migration: Migration[T]
+    elapsed: float
+    # synthetic rows in the tables the migration read or wrote
+    rows: int
+    budget: Optional[Budget]
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else float("inf")
+
+    def violations(self) -> List[str]:
+        if self.budget is None:
+            return []
+        name = f"{self.migration.from_rev} -> {self.migration.to_rev}"
+        violations: List[str] = []
+        if self.budget.seconds is not None and self.elapsed > self.budget.seconds:
+            violations.append(
+                f"{name} took {self.elapsed:.2f}s, budget is {self.budget.seconds}s"
+            )
+        # migrations that only touch empty or new tables have no throughput
+        if (
+            self.budget.rows_per_second is not None
+            and self.rows
+            and self.rows_per_second < self.budget.rows_per_second
+        ):
+            violations.append(
+                f"{name} processed {self.rows_per_second:.0f} rows/s,"
+                f" budget is {self.budget.rows_per_second:.0f} rows/s"
+            )
+        return violations
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, results: Sequence[LoadTestResult[T]]) -> None:
+        self.results = results
+        violations = [v for r in results for v in r.violations()]
+        super().__init__("\n".join(violations))
+
+
+async def load_test(
+    backend: SupportsBackend[T],
+    directory: Union[str, pathlib.Path, MigrationRepository[T]],
+    target_revision: str,
+    data: SupportsSyntheticData[T],
+    rows: int,
+    default_budget: Optional[Budget] = None,
+    phase: Optional[Phase] = None,
+) -> Sequence[LoadTestResult[T]]:
+    """Run migrations one at a time against tables filled with synthetic data.
+
+    Before each migration every table that exists at that point is topped up
+    to `rows` rows. Each migration is then timed and checked against its
+    declared budget (or `default_budget`), raising BudgetExceeded after all
+    migrations have run if any of them went over. Throughput is measured
+    over the rows of the tables the migration read or wrote.
+    If a `phase` is given only migrations of that phase are tested.
+
+    This commits every migration separately and fills the database with junk,
+    so only point it at a throwaway database.
+    """
+    planned = await plan(backend, directory, target_revision, Direction.up, phase)
+    results: List[LoadTestResult[T]] = []
+    for mig in planned:
+        populated: List[Mapping[str, int]] = []
+        touched: Set[str] = set()
+
+        async def populate(connection: T) -> None:
+            populated.append(await data.populate(connection, rows))
+
+        async def measured(connection: T) -> None:
+            async with data.touched_tables(connection) as tables:
+                await mig.operation(connection)
+            touched.update(tables)
+
+        async with backend.connect() as exec:
+            await exec.execute_operation(populate)
+        (applied,) = (
+            await execute(backend, [replace(mig, operation=measured)])
+        ).applied
+        result = LoadTestResult(
+            migration=mig,
+            elapsed=applied.elapsed,
+            rows=sum(n for table, n in populated[0].items() if table in touched),
+            budget=mig.budget or default_budget,
+        )
+        logger.info(
+            f"{mig.from_rev} -> {mig.to_rev} took {result.elapsed:.2f}s"
+            f" with {result.rows} rows ({result.rows_per_second:.0f} rows/s)"
+        )
+        results.append(result)
+    if any(r.violations() for r in results):
+        raise BudgetExceeded(results)
+    return results
@@ -0,0 +1,54 @@
+import os
+import sys
+from types import FrameType
+from typing import Any, List, Optional
+
+from asyncpg_trek._types import Migration, StatementProfile
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StatementRecorder:
+    """Collects the statements issued by a single migration.
+
+    Instrumented connections call `record()` synchronously from the method
+    that issued the statement so that the call site can be recovered
+    from the stack.
+    """
+
+    def __init__(self, migration: Migration[Any]) -> None:
+        self.migration = migration
+        self.statements: List[StatementProfile] = []
+
+    def record(
+        self,
+        statement: str,
+        elapsed: float,
+        rows: Optional[int] = None,
+        plan: Optional[str] = None,
+    ) -> None:
+        self.statements.append(
+            StatementProfile(
+                statement=statement,
+                elapsed=elapsed,
+                rows=rows,
+                call_site=self._call_site(sys._getframe(1)),
+                plan=plan,
+            )
+        )
+
+    def _call_site(self, frame: Optional[FrameType]) -> Optional[str]:
+        path = self.migration.path
+        if path is not None and path.suffix != ".py":
+            # SQL files are executed as a single statement
+            return str(path)
+        migration_file = None if path is None else str(path.absolute())
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if migration_file is not None:
+                if filename == migration_file:
+                    return f"{filename}:{frame.f_lineno}"
+            elif not os.path.abspath(filename).startswith(_PACKAGE_DIR):
+                return f"{filename}:{frame.f_lineno}"
+            frame = frame.f_back
+        return None
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import os
+import pathlib
+import time
+from dataclasses import dataclass, replace
+from logging import getLogger
+from typing import Collection, Dict, Generic, Optional, Tuple, TypeVar, Union
+
+from asyncpg_trek._backend import SupportsBackend
+from asyncpg_trek._collect import (
+    MIGRATION_FILE_PATT,
+    check_has_initial_migration,
+    parse_migration_file,
+)
+from asyncpg_trek._solver import MigrationGraph, build_migration_graph
+from asyncpg_trek._types import Direction, Migration
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class _IndexedFile(Generic[T]):
+    # (st_mtime_ns, st_size), used to skip hashing files that were not touched
+    stat: Tuple[int, int]
+    digest: str
+    migration: Migration[T]
+
+
+class MigrationRepository(Generic[T]):
+    """A long lived, in-memory index of a revisions directory.
+
+    Files are only re-loaded when they are added or their contents change,
+    which is detected by comparing stat results and then content hashes.
+    This makes repeated calls to `plan()` cheap while still picking up edits
+    to migrations without restarting the process.
+
+    The backend is only used to prepare operations for SQL files.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, pathlib.Path],
+        backend: SupportsBackend[T],
+        poll_interval: float = 0.0,
+    ) -> None:
+        self.directory = pathlib.Path(directory)
+        self.backend = backend
+        # minimum number of seconds between re-scans of the directory
+        self.poll_interval = poll_interval
+        self._files: Dict[pathlib.Path, _IndexedFile[T]] = {}
+        self._graphs: Dict[Direction, MigrationGraph[T]] = {}
+        self._last_refresh: Optional[float] = None
+
+    def refresh(self) -> bool:
+        """Re-scan the directory, returning True if any migrations were
+        added, changed or removed.
+        """
+        files: Dict[pathlib.Path, _IndexedFile[T]] = {}
+        changed = self._last_refresh is None
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not MIGRATION_FILE_PATT.match(entry.name):
+                    continue
+                path = pathlib.Path(entry.path)
+                st = entry.stat()
+                stat = (st.st_mtime_ns, st.st_size)
+                indexed = self._files.get(path)
+                if indexed is not None and indexed.stat == stat:
+                    files[path] = indexed
+                    continue
+                digest = hashlib.sha256(path.read_bytes()).hexdigest()
+                if indexed is not None and indexed.digest == digest:
+                    files[path] = replace(indexed, stat=stat)
+                    continue
+                logger.debug(f"Loading migration {path}")
+                migration = parse_migration_file(path, self.backend)
+                assert migration is not None
+                files[path] = _IndexedFile(stat, digest, migration)
+                changed = True
+        if files.keys() != self._files.keys():
+            changed = True
+        if changed:
+            check_has_initial_migration(f.migration for f in files.values())
+            self._graphs.clear()
+        self._files = files
+        self._last_refresh = time.monotonic()
+        return changed
+
+    def _maybe_refresh(self) -> None:
+        if (
+            self._last_refresh is None
+            or time.monotonic() - self._last_refresh >= self.poll_interval
+        ):
+            self.refresh()
+
+    def _graph(self, direction: Direction) -> MigrationGraph[T]:
+        if direction not in self._graphs:
+            self._graphs[direction] = build_migration_graph(
+                direction, [f.migration for f in self._files.values()]
+            )
+        return self._graphs[direction]
+
+    def migrations(self) -> Collection[Migration[T]]:
+        self._maybe_refresh()
+        return [f.migration for f in self._files.values()]
+
+    def graph(self, direction: Direction) -> MigrationGraph[T]:
+        self._maybe_refresh()
+        return self._graph(direction)
+
+    def snapshot(
+        self, direction: Direction
+    ) -> Tuple[Collection[Migration[T]], MigrationGraph[T]]:
+        """The migrations and the graph built from them, from a single re-scan"""
+        self._maybe_refresh()
+        return [f.migration for f in self._files.values()], self._graph(direction)
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """Re-scan the directory every `interval` seconds until cancelled.
+
+        This is only needed to load changes eagerly, `plan()` will otherwise
+        re-scan the directory lazily. Failed re-scans, e.g. because a file is
+        only partially written, are logged and the previously loaded
+        migrations are kept until the next successful one.
+        """
+        while True:
+            try:
+                if self.refresh():
+                    logger.info(f"Reloaded migrations from {self.directory}")
+            except Exception:
+                logger.exception(f"Failed to reload migrations from {self.directory}")
+            await asyncio.sleep(interval)
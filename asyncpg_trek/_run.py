@@ -1,12 +1,53 @@
+import inspect
 import pathlib
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
 from logging import getLogger
-from typing import Sequence, TypeVar, Union
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
-from asyncpg_trek._backend import SupportsBackend
+from asyncpg_trek._backend import (
+    SupportsBackend,
+    SupportsBackendExecutor,
+    SupportsDurations,
+    SupportsGovernor,
+    SupportsPhases,
+    SupportsPostExecute,
+    SupportsProfiler,
+    SupportsSettings,
+)
 from asyncpg_trek._collect import collect_migrations_from_filesystem
-from asyncpg_trek._solver import find_migration_path
+from asyncpg_trek._profile import StatementRecorder
+from asyncpg_trek._repository import MigrationRepository
+from asyncpg_trek._solver import build_migration_graph
+from asyncpg_trek._types import (
+    INITIAL_REVISION,
+)
 from asyncpg_trek._types import Direction as MigrationDirection
-from asyncpg_trek._types import Migration
+from asyncpg_trek._types import (
+    ExecutionResult,
+    Migration,
+    MigrationResult,
+    Operation,
+    Phase,
+    Revision,
+)
 
 logger = getLogger(__name__)
 
@@ -14,43 +55,342 @@ logger = getLogger(__name__)
 T = TypeVar("T")
 
 
+async def _deferred(connection: Any) -> None:
+    pass
+
+
+def _in_phase(mig: Migration[T], phase: Phase) -> Migration[T]:
+    own_phase = mig.phase or Phase.expand
+    if own_phase is phase:
+        return replace(mig, phase=phase)
+    logger.debug(
+        f"Deferring {mig.from_rev} -> {mig.to_rev} to the {own_phase.name} phase"
+    )
+    return replace(
+        mig,
+        phase=phase,
+        operation=_deferred,
+        deferred=True,
+        settings={},
+        budget=None,
+    )
+
+
+def supports_phases(exec: SupportsBackendExecutor[Any]) -> bool:
+    # phases are optional for executors, see SupportsPhases
+    try:
+        parameters = inspect.signature(exec.get_current_revision).parameters
+    except (TypeError, ValueError):
+        return False
+    return "phase" in parameters
+
+
+async def get_current_revision(
+    exec: SupportsBackendExecutor[T], phase: Optional[Phase] = None
+) -> Revision:
+    """The revision `phase` has reached, or the revision of the database
+    if no phase is given, which is ambiguous once the phases have diverged.
+    """
+    if phase is not None:
+        if not supports_phases(exec):
+            raise TypeError("The backend does not support phases")
+        phased = cast(SupportsPhases, exec)
+        return await phased.get_current_revision(phase.name) or INITIAL_REVISION
+    if not supports_phases(exec):
+        return await exec.get_current_revision() or INITIAL_REVISION
+    phased = cast(SupportsPhases, exec)
+    expanded = await phased.get_current_revision(Phase.expand.name)
+    contracted = await phased.get_current_revision(Phase.contract.name)
+    if expanded != contracted:
+        raise ValueError(
+            f"The expand phase is at {expanded or INITIAL_REVISION} and the contract"
+            f" phase at {contracted or INITIAL_REVISION}, a phase must be given"
+            " until the contract phase catches up"
+        )
+    return expanded or INITIAL_REVISION
+
+
+async def find_plan(
+    exec: SupportsBackendExecutor[T],
+    find_path: Callable[[Revision, Revision], Sequence[Migration[T]]],
+    current_revision: Revision,
+    target_revision: Revision,
+    phase: Optional[Phase] = None,
+) -> Sequence[Migration[T]]:
+    """The migrations from `current_revision` to `target_revision`,
+    limited to those of `phase` if one is given.
+    """
+    path = find_path(current_revision, target_revision)
+    if phase is None:
+        return path
+    if phase is Phase.contract:
+        expanded = await get_current_revision(exec, Phase.expand)
+        reachable = {m.to_rev for m in find_path(current_revision, expanded)}
+        if target_revision != current_revision and target_revision not in reachable:
+            raise ValueError(
+                f"Can't contract to {target_revision} before it has been expanded,"
+                f" the expand phase is at {expanded}"
+            )
+    return [_in_phase(mig, phase) for mig in path]
+
+
 async def plan(
     backend: SupportsBackend[T],
-    directory: Union[str, pathlib.Path],
+    directory: Union[str, pathlib.Path, MigrationRepository[T]],
     target_revision: str,
     direction: MigrationDirection,
+    phase: Optional[Phase] = None,
 ) -> Sequence[Migration[T]]:
-    migrations = collect_migrations_from_filesystem(pathlib.Path(directory), backend)
+    """Find the migrations needed to get from the current revision to
+    `target_revision`.
+
+    If a `phase` is given, the plan starts from the revision that phase has
+    reached and only runs migrations of that phase, migrations without a phase
+    being part of the expand phase. Migrations of the other phase stay in the
+    plan as no-ops so that each phase keeps track of its own revision.
+    The contract phase can't go past the revision reached by the expand phase,
+    and planning without a phase is refused while the two phases are at
+    different revisions.
+    """
+    if phase is not None and direction is not MigrationDirection.up:
+        raise ValueError("Phases can only be used to migrate up")
+    if isinstance(directory, MigrationRepository):
+        migrations, graph = directory.snapshot(direction)
+    else:
+        migrations = collect_migrations_from_filesystem(
+            pathlib.Path(directory), backend
+        )
+        graph = build_migration_graph(direction, migrations)
     rev_list = "\n".join([f" - {m.from_rev} -> {m.to_rev}" for m in migrations])
     logger.debug(f"Collected migrations from {directory}: {rev_list}")
     logger.debug("Creating migrations table")
     async with backend.connect() as exec:
         await exec.create_table_idempotent()
         logger.debug("Getting current revision")
-        current_revision = await exec.get_current_revision()
-        if current_revision:
+        current_revision = await get_current_revision(exec, phase)
+        if current_revision != INITIAL_REVISION:
             logger.info(f"Current revision is {current_revision}")
         else:
-            current_revision = "initial"
             logger.info("No existing revisions found, starting from scratch")
-        return find_migration_path(
-            current_revision,
-            target_revision,
-            direction=direction,
-            migrations=migrations,
+        return await find_plan(
+            exec, graph.find_path, current_revision, target_revision, phase
+        )
+
+
+async def get_migration_durations(
+    backend: SupportsBackend[T],
+) -> Dict[Tuple[Revision, Revision], float]:
+    """Get how long each migration took the last time it ran against this
+    database, keyed by (from revision, to revision).
+
+    This can be read from a staging database and passed to `execute()`
+    as `estimates` when migrating production. Backends that don't record
+    durations have none.
+    """
+    async with backend.connect() as exec:
+        await exec.create_table_idempotent()
+        return dict(await _get_durations(exec))
+
+
+async def _get_durations(
+    exec: SupportsBackendExecutor[T],
+) -> Mapping[Tuple[Revision, Revision], float]:
+    # durations are optional for executors, see SupportsDurations
+    if hasattr(exec, "get_durations"):
+        return await cast(SupportsDurations, exec).get_durations()
+    return {}
+
+
+def _estimate(
+    mig: Migration[T], estimates: Mapping[Tuple[Revision, Revision], float]
+) -> Optional[float]:
+    if mig.deferred:
+        return None
+    estimate = estimates.get((mig.from_rev, mig.to_rev))
+    if estimate is None and mig.budget is not None:
+        estimate = mig.budget.seconds
+    return estimate
+
+
+async def _throttle(
+    exec: SupportsBackendExecutor[T], governor: SupportsGovernor[T]
+) -> float:
+    # the governor needs the connection, which only the executor has access to
+    waited: List[float] = []
+
+    async def throttle(connection: T) -> None:
+        waited.append(await governor.throttle(connection))
+
+    await exec.execute_operation(throttle)
+    return sum(waited)
+
+
+@dataclass
+class _Throttling(Generic[T]):
+    governor: SupportsGovernor[T]
+    # the connection the migration runs on, once it has started
+    connection: Optional[T] = None
+    waited: float = 0.0
+
+
+_throttling: "ContextVar[Optional[_Throttling[Any]]]" = ContextVar(
+    "asyncpg_trek_throttling", default=None
+)
+
+
+async def throttle() -> float:
+    """Wait for the governor passed to `execute()`, returning the seconds waited.
+
+    Python migrations that write in batches can call this between batches.
+    It returns immediately outside of `execute()` or if no governor was given.
+    """
+    throttling = _throttling.get()
+    if throttling is None or throttling.connection is None:
+        return 0.0
+    waited = await throttling.governor.throttle(throttling.connection)
+    throttling.waited += waited
+    return waited
+
+
+def _governed(operation: Operation[T], throttling: _Throttling[T]) -> Operation[T]:
+    async def governed(connection: T) -> None:
+        throttling.connection = connection
+        token = _throttling.set(throttling)
+        try:
+            await operation(connection)
+        finally:
+            _throttling.reset(token)
+
+    return governed
+
+
+@asynccontextmanager
+async def _no_settings() -> AsyncIterator[None]:
+    yield
+
+
+def _apply_settings(
+    exec: SupportsBackendExecutor[T], mig: Migration[T]
+) -> AsyncContextManager[None]:
+    # settings are optional for executors, see SupportsSettings
+    if hasattr(exec, "apply_settings"):
+        return cast(SupportsSettings, exec).apply_settings(mig.settings)
+    if mig.settings:
+        logger.warning(
+            f"Ignoring the settings of {mig.from_rev} -> {mig.to_rev},"
+            " the backend does not support them"
         )
+    return _no_settings()
+
+
+def _profiled(
+    operation: Operation[T], profiler: SupportsProfiler[T], recorder: StatementRecorder
+) -> Operation[T]:
+    async def profiled(connection: T) -> None:
+        await operation(profiler.instrument(connection, recorder))
+
+    return profiled
 
 
 async def execute(
     backend: SupportsBackend[T],
     plan: Sequence[Migration[T]],
-) -> None:
+    governor: Optional[SupportsGovernor[T]] = None,
+    profiler: Optional[SupportsProfiler[T]] = None,
+    deadline: Optional[float] = None,
+    time_budget: Optional[float] = None,
+    estimates: Optional[Mapping[Tuple[Revision, Revision], float]] = None,
+    post_execute: Optional[SupportsPostExecute[T]] = None,
+) -> ExecutionResult[T]:
+    """Execute a plan returned by `plan()`.
+
+    The `governor` is consulted before each migration and whenever a Python
+    migration calls `throttle()`.
+
+    If a `deadline` (a `time.time()` timestamp) or a `time_budget` (in seconds)
+    is given, migrations that are not expected to finish in time are not started.
+    Everything applied up to that point is committed and the rest of the plan
+    is returned in `ExecutionResult.remaining` so that it can be resumed later.
+    How long a migration will take is estimated from `estimates`, then from
+    durations recorded in this database the last time it ran and finally from
+    its declared `budget.seconds`.
+    Migrations without any estimate are always started.
+
+    `post_execute` can be used to follow up on the plan once it has been
+    committed, e.g. to refresh statistics of the tables it changed.
+    """
+    applied: List[MigrationResult[T]] = []
+    remaining: Sequence[Migration[T]] = ()
+    stop_at: Optional[float] = None
+    if deadline is not None:
+        stop_at = time.monotonic() + deadline - time.time()
+    if time_budget is not None:
+        budget_end = time.monotonic() + time_budget
+        stop_at = budget_end if stop_at is None else min(stop_at, budget_end)
     async with backend.connect() as exec:
-        for mig in plan:
+        known: Mapping[Tuple[Revision, Revision], float] = {}
+        if stop_at is not None:
+            known = {**(await _get_durations(exec)), **(estimates or {})}
+        if post_execute is not None:
+            await exec.execute_operation(post_execute.before_plan)
+        for idx, mig in enumerate(plan):
+            throttled = 0.0
+            if governor is not None:
+                throttled = await _throttle(exec, governor)
+                if throttled:
+                    logger.info(
+                        f"Throttled {mig.from_rev} -> {mig.to_rev} for {throttled:.2f}s"
+                    )
+            if stop_at is not None:
+                estimate = _estimate(mig, known)
+                left = stop_at - time.monotonic()
+                if estimate is not None and estimate > left:
+                    logger.info(
+                        f"Not running {mig.from_rev} -> {mig.to_rev}, it is expected"
+                        f" to take {estimate:.2f}s but only {max(left, 0):.2f}s are left"
+                    )
+                    remaining = plan[idx:]
+                    break
             logger.info(f"Running {mig.from_rev} -> {mig.to_rev}")
-            await exec.record_migration(
-                from_revision=mig.from_rev,
-                to_revision=mig.to_rev,
+            start = time.monotonic()
+            if mig.phase is None:
+                await exec.record_migration(
+                    from_revision=mig.from_rev, to_revision=mig.to_rev
+                )
+            else:
+                await cast(SupportsPhases, exec).record_migration(
+                    from_revision=mig.from_rev,
+                    to_revision=mig.to_rev,
+                    phase=mig.phase.name,
+                )
+            recorder = StatementRecorder(mig)
+            operation = mig.operation
+            if profiler is not None:
+                operation = _profiled(operation, profiler, recorder)
+            throttling: Optional[_Throttling[T]] = None
+            if governor is not None:
+                # outermost, so that the governor gets the actual connection
+                throttling = _Throttling(governor)
+                operation = _governed(operation, throttling)
+            async with _apply_settings(exec, mig):
+                await exec.execute_operation(operation)
+            elapsed = time.monotonic() - start
+            if throttling is not None:
+                elapsed -= throttling.waited
+                throttled += throttling.waited
+            if not mig.deferred and hasattr(exec, "record_duration"):
+                await cast(SupportsDurations, exec).record_duration(elapsed)
+            logger.info(f"{mig.from_rev} -> {mig.to_rev} OK ({elapsed:.2f}s)")
+            applied.append(
+                MigrationResult(
+                    mig,
+                    elapsed=elapsed,
+                    throttled=throttled,
+                    statements=recorder.statements,
+                )
             )
-            await exec.execute_operation(mig.operation)
-            logger.info(f"{mig.from_rev} -> {mig.to_rev} OK")
+        if post_execute is not None:
+            await exec.execute_operation(post_execute.after_plan)
+    if post_execute is not None:
+        await post_execute.after_commit()
+    return ExecutionResult(applied, remaining=remaining)
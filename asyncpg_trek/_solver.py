@@ -1,9 +1,11 @@
 from collections import defaultdict, deque
+from dataclasses import dataclass
 from itertools import tee
 from typing import (
     Collection,
     Deque,
     Dict,
+    Generic,
     Iterable,
     List,
     Mapping,
@@ -39,12 +41,25 @@ def shortest_path(graph: Mapping[T, Sequence[T]], start: T, end: T) -> Sequence[
     raise LookupError
 
 
-def find_migration_path(
-    current: Revision,
-    target: Revision,
+@dataclass(frozen=True)
+class MigrationGraph(Generic[T]):
+    """All of the migrations in a single direction, indexed for path finding"""
+
+    edges: Mapping[Tuple[Revision, Revision], Migration[T]]
+    adjacency: Mapping[Revision, Sequence[Revision]]
+
+    def find_path(self, current: Revision, target: Revision) -> Sequence[Migration[T]]:
+        try:
+            path = shortest_path(self.adjacency, current, target)
+        except LookupError:
+            raise LookupError(f"No path found from {current} to rev {target} found")
+        return [self.edges[(frm, to)] for frm, to in pairwise(path)]
+
+
+def build_migration_graph(
     direction: Direction,
     migrations: Collection[Migration[T]],
-) -> Sequence[Migration[T]]:
+) -> MigrationGraph[T]:
     migrations = [m for m in migrations if m.direction == direction]
     edges: Dict[Tuple[Revision, Revision], Migration[T]] = {}
     for migration in migrations:
@@ -59,8 +74,14 @@ def find_migration_path(
     rev_graph: Dict[Revision, List[Revision]] = defaultdict(list)
     for frm, to in edges.keys():
         rev_graph[frm].append(to)
-    try:
-        path = shortest_path(rev_graph, current, target)
-    except LookupError:
-        raise LookupError(f"No path found from {current} to rev {target} found")
-    return [edges[(frm, to)] for frm, to in pairwise(path)]
+    return MigrationGraph(edges=edges, adjacency=dict(rev_graph))
+
+
+def find_migration_path(
+    current: Revision,
+    target: Revision,
+    direction: Direction,
+    migrations: Collection[Migration[T]],
+) -> Sequence[Migration[T]]:
+    graph = build_migration_graph(direction, migrations)
+    return graph.find_path(current, target)
@@ -0,0 +1,162 @@
+import asyncio
+import pathlib
+import re
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Generic,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from asyncpg_trek._backend import SupportsBackend
+from asyncpg_trek._repository import MigrationRepository
+from asyncpg_trek._run import execute, plan
+from asyncpg_trek._types import Direction, ExecutionResult, Phase
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_TABLE = "migrations"
+TRACK_NAME_PATT = re.compile(r"^\w+$")
+
+
+def table_for_track(track: Optional[str]) -> str:
+    """Name of the table recording the revision history of a track.
+
+    Each track gets its own table so that tracks migrating concurrently
+    never read or write the same rows.
+    """
+    if track is None:
+        return DEFAULT_TABLE
+    if not TRACK_NAME_PATT.match(track):
+        raise ValueError(
+            f"Invalid track name {track!r}, only letters, digits and underscores are allowed"
+        )
+    return f"{DEFAULT_TABLE}_{track}"
+
+
+@dataclass(frozen=True)
+class Track(Generic[T]):
+    name: str
+    # must be configured with the same track name, e.g.
+    # AsyncpgBackend(conn, track=name), and use its own connection
+    # if tracks are to run concurrently
+    backend: SupportsBackend[T]
+    directory: Union[str, pathlib.Path, MigrationRepository[T]]
+    target_revision: str
+    direction: Direction = Direction.up
+    # tracks that must be fully migrated before this one starts
+    depends_on: Collection[str] = ()
+    # only run migrations of this phase, see `plan()`
+    phase: Optional[Phase] = None
+
+
+@dataclass(frozen=True)
+class TracksResult:
+    results: Mapping[str, ExecutionResult[Any]] = field(default_factory=dict)
+    failures: Mapping[str, BaseException] = field(default_factory=dict)
+    # tracks that were not run because a dependency failed
+    skipped: Collection[str] = ()
+
+
+class _DependencyFailed(Exception):
+    pass
+
+
+def _topological_order(tracks: Mapping[str, Track[Any]]) -> List[str]:
+    order: List[str] = []
+    visiting: List[str] = []
+
+    def visit(name: str) -> None:
+        if name in order:
+            return
+        if name in visiting:
+            cycle = " -> ".join(visiting[visiting.index(name) :] + [name])
+            raise ValueError(f"Cyclic track dependencies: {cycle}")
+        if name not in tracks:
+            raise LookupError(f"Track {visiting[-1]} depends on unknown track {name}")
+        visiting.append(name)
+        for dep in tracks[name].depends_on:
+            visit(dep)
+        visiting.pop()
+        order.append(name)
+
+    for name in tracks:
+        visit(name)
+    return order
+
+
+def _check_backend_table(track: Track[Any]) -> None:
+    # backends that don't expose their bookkeeping table can't be checked
+    table = getattr(track.backend, "table", None)
+    if table is not None and table != table_for_track(track.name):
+        raise ValueError(
+            f"The backend of track {track.name} records its revisions in {table},"
+            f" expected {table_for_track(track.name)}"
+        )
+
+
+async def migrate_tracks(tracks: Sequence[Track[Any]]) -> TracksResult:
+    """Plan and execute several independent tracks.
+
+    Tracks run concurrently unless one depends on another, in which case it
+    waits for its dependencies to finish. A failing track only prevents the
+    tracks that depend on it from running.
+    """
+    by_name: Dict[str, Track[Any]] = {}
+    for track in tracks:
+        if track.name in by_name:
+            raise ValueError(f"Duplicate track {track.name}")
+        by_name[track.name] = track
+        _check_backend_table(track)
+    tasks: Dict[str, "asyncio.Future[ExecutionResult[Any]]"] = {}
+
+    async def run(track: Track[Any]) -> ExecutionResult[Any]:
+        for dep in track.depends_on:
+            try:
+                await asyncio.shield(tasks[dep])
+            except Exception as e:
+                raise _DependencyFailed(dep) from e
+        logger.info(f"Migrating track {track.name}")
+        planned = await plan(
+            track.backend,
+            track.directory,
+            track.target_revision,
+            track.direction,
+            track.phase,
+        )
+        return await execute(track.backend, planned)
+
+    for name in _topological_order(by_name):
+        tasks[name] = asyncio.ensure_future(run(by_name[name]))
+    try:
+        if tasks:
+            await asyncio.wait(tasks.values())
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    results: Dict[str, ExecutionResult[Any]] = {}
+    failures: Dict[str, BaseException] = {}
+    skipped: List[str] = []
+    for name, task in tasks.items():
+        exc = task.exception()
+        if isinstance(exc, _DependencyFailed):
+            logger.warning(f"Skipped track {name} because {exc.args[0]} failed")
+            skipped.append(name)
+        elif exc is not None:
+            logger.error(f"Track {name} failed", exc_info=exc)
+            failures[name] = exc
+        else:
+            results[name] = task.result()
+    return TracksResult(results=results, failures=failures, skipped=skipped)
@@ -1,7 +1,17 @@
 import enum
+import pathlib
 import sys
-from dataclasses import dataclass
-from typing import Awaitable, Callable, Generic, TypeVar
+from dataclasses import dataclass, field
+from typing import (
+    Awaitable,
+    Callable,
+    Generic,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+)
 
 if sys.version_info < (3, 8):
     from typing_extensions import Literal
@@ -24,9 +34,110 @@ class Direction(enum.Enum):
     down = enum.auto()
 
 
+class Phase(enum.Enum):
+    # additive changes applied before new code is rolled out,
+    # migrations without a phase belong here
+    expand = enum.auto()
+    # destructive changes applied once no old code is left running
+    contract = enum.auto()
+
+
+@dataclass(frozen=True)
+class Budget:
+    # the most seconds the migration may take
+    seconds: Optional[float] = None
+    # the least number of rows of the tables it reads or writes that the
+    # migration must get through per second
+    rows_per_second: Optional[float] = None
+
+
 @dataclass(frozen=True)
 class Migration(Generic[T]):
     operation: Operation[T]
     from_rev: Revision
     to_rev: Revision
     direction: Direction
+    # the file this migration was collected from, if any
+    path: Optional[pathlib.Path] = None
+    # session settings (or PRAGMAs for sqlite) to apply while this migration runs
+    settings: Mapping[str, str] = field(default_factory=dict, hash=False)
+    # performance budget enforced by load_test(), budget.seconds is also used
+    # by execute() to estimate how long the migration will take
+    budget: Optional[Budget] = None
+    # the expand/contract phase this migration is run in, in a plan for
+    # a single phase this is that phase
+    phase: Optional[Phase] = None
+    # a no-op standing in for a migration of another phase in a plan for
+    # a single phase, only its revision is recorded
+    deferred: bool = False
+
+
+@dataclass(frozen=True)
+class StatementProfile:
+    statement: str
+    elapsed: float
+    # rows returned or affected, if the driver reports it
+    rows: Optional[int] = None
+    # file:line of the code in the migration that issued the statement
+    call_site: Optional[str] = None
+    # EXPLAIN (ANALYZE, BUFFERS) output, if the statement was explained
+    plan: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class MigrationResult(Generic[T]):
+    migration: Migration[T]
+    # wall clock seconds spent running the migration, excluding throttling
+    elapsed: float
+    # seconds spent waiting on a governor before and during the migration
+    throttled: float = 0.0
+    # only collected when a profiler is passed to execute()
+    statements: Sequence[StatementProfile] = ()
+
+    def slowest(self, n: int) -> Sequence[StatementProfile]:
+        return sorted(self.statements, key=lambda s: s.elapsed, reverse=True)[:n]
+
+
+@dataclass(frozen=True)
+class ExecutionResult(Generic[T]):
+    applied: Sequence[MigrationResult[T]]
+    # migrations that were not started because they would not finish in time
+    remaining: Sequence[Migration[T]] = ()
+
+    @property
+    def revision(self) -> Optional[Revision]:
+        """The revision the database was left at, None for an empty plan"""
+        if self.applied:
+            return self.applied[-1].migration.to_rev
+        if self.remaining:
+            return self.remaining[0].from_rev
+        return None
+
+    @property
+    def complete(self) -> bool:
+        return not self.remaining
+
+    @property
+    def elapsed(self) -> float:
+        return sum(r.elapsed for r in self.applied)
+
+    @property
+    def throttled(self) -> float:
+        return sum(r.throttled for r in self.applied)
+
+    def slow_statement_report(self, n: int = 5) -> str:
+        """Format the `n` slowest statements of each migration"""
+        lines: List[str] = []
+        for result in self.applied:
+            mig = result.migration
+            lines.append(f"{mig.from_rev} -> {mig.to_rev} ({result.elapsed:.3f}s)")
+            for stmt in result.slowest(n):
+                statement = " ".join(stmt.statement.split())
+                if len(statement) > 80:
+                    statement = statement[:77] + "..."
+                rows = "" if stmt.rows is None else f" rows={stmt.rows}"
+                site = "" if stmt.call_site is None else f" at {stmt.call_site}"
+                lines.append(f"  {stmt.elapsed:.3f}s{rows}{site}: {statement}")
+                if stmt.plan is not None:
+                    lines.extend(f"      {line}" for line in stmt.plan.splitlines())
+        return "\n".join(lines)
@@ -0,0 +1,178 @@
+import asyncio
+import multiprocessing
+import pathlib
+import sys
+import time
+import traceback
+from dataclasses import dataclass, replace
+from logging import getLogger
+from multiprocessing.connection import Connection
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from asyncpg_trek._backend import SupportsBackend
+from asyncpg_trek._run import execute, plan
+from asyncpg_trek._types import Direction, Migration, Phase, Revision
+
+if sys.version_info < (3, 8):
+    from typing_extensions import Literal
+else:
+    from typing import Literal
+
+logger = getLogger(__name__)
+
+# must be picklable, e.g. a module level function decorated with
+# contextlib.asynccontextmanager that connects to the database
+BackendFactory = Callable[[], AsyncContextManager[SupportsBackend[Any]]]
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    kind: Literal["planned", "started", "finished", "completed"]
+    # the migration that started or finished
+    from_rev: Optional[Revision] = None
+    to_rev: Optional[Revision] = None
+    # seconds the migration took for "finished", the whole plan for "completed"
+    elapsed: Optional[float] = None
+    # (from, to) revisions of every migration in the plan, for "planned"
+    plan: Sequence[Tuple[Revision, Revision]] = ()
+    # the revision the database was left at, for "completed"
+    revision: Optional[Revision] = None
+
+
+class MigrationWorkerError(Exception):
+    """The worker process failed, the message is its formatted traceback"""
+
+
+def _reporting(mig: Migration[Any], conn: Connection) -> Migration[Any]:
+    async def operation(connection: Any) -> None:
+        conn.send(ProgressEvent("started", mig.from_rev, mig.to_rev))
+        start = time.monotonic()
+        await mig.operation(connection)
+        elapsed = time.monotonic() - start
+        conn.send(ProgressEvent("finished", mig.from_rev, mig.to_rev, elapsed))
+
+    return replace(mig, operation=operation)
+
+
+async def _work(
+    conn: Connection,
+    backend_factory: BackendFactory,
+    directory: str,
+    target_revision: str,
+    direction: Direction,
+    phase: Optional[Phase],
+) -> None:
+    async with backend_factory() as backend:
+        planned = await plan(backend, directory, target_revision, direction, phase)
+        conn.send(
+            ProgressEvent("planned", plan=[(m.from_rev, m.to_rev) for m in planned])
+        )
+        result = await execute(backend, [_reporting(m, conn) for m in planned])
+    # only once the factory has committed and cleaned up
+    conn.send(
+        ProgressEvent("completed", elapsed=result.elapsed, revision=result.revision)
+    )
+
+
+def _worker_main(
+    conn: Connection,
+    backend_factory: BackendFactory,
+    directory: str,
+    target_revision: str,
+    direction: Direction,
+    phase: Optional[Phase],
+) -> None:
+    try:
+        asyncio.run(
+            _work(conn, backend_factory, directory, target_revision, direction, phase)
+        )
+    except BaseException:
+        # exceptions are not necessarily picklable
+        conn.send(traceback.format_exc())
+    finally:
+        conn.close()
+
+
+async def migrate_in_subprocess(
+    backend_factory: BackendFactory,
+    directory: Union[str, pathlib.Path],
+    target_revision: str,
+    direction: Direction = Direction.up,
+    timeout: Optional[float] = None,
+    poll_interval: float = 0.05,
+    phase: Optional[Phase] = None,
+    exit_timeout: float = 5.0,
+) -> AsyncIterator[ProgressEvent]:
+    """Plan and execute migrations in a separate process, yielding progress
+    events as they happen.
+
+    This keeps slow or blocking Python migrations from stalling the calling
+    process' event loop. `backend_factory` is called in the worker process,
+    so it and anything it needs must be picklable. `phase` is passed to `plan()`.
+    The "completed" event is sent once the backend factory has exited,
+    after which the worker gets `exit_timeout` seconds to shut down.
+
+    The worker is killed if the iteration is cancelled or stopped early,
+    or if it runs for longer than `timeout` seconds, in which case
+    asyncio.TimeoutError is raised. Like any other failure this leaves
+    uncommitted migrations to be rolled back by the database.
+    If the worker fails, MigrationWorkerError is raised with its traceback.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(
+        target=_worker_main,
+        args=(
+            sender,
+            backend_factory,
+            str(directory),
+            target_revision,
+            direction,
+            phase,
+        ),
+        daemon=True,
+    )
+    process.start()
+    # so that the receiving end sees EOF if the worker dies
+    sender.close()
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    completed = False
+    try:
+        while True:
+            while not receiver.poll():
+                if deadline is not None and loop.time() >= deadline:
+                    raise asyncio.TimeoutError(
+                        f"Migrating to {target_revision} took longer than {timeout}s"
+                    )
+                await asyncio.sleep(poll_interval)
+            try:
+                message = receiver.recv()
+            except EOFError:
+                raise MigrationWorkerError(
+                    "The worker exited without reporting a result"
+                ) from None
+            if isinstance(message, str):
+                raise MigrationWorkerError(message)
+            if message.kind == "completed":
+                completed = True
+            yield message
+            if completed:
+                return
+    finally:
+        if completed:
+            await loop.run_in_executor(None, process.join, exit_timeout)
+        if process.is_alive():
+            logger.warning("Terminating migration worker")
+            process.terminate()
+        await loop.run_in_executor(None, process.join)
+        receiver.close()
@@ -0,0 +1,14 @@
+from asyncpg_trek.aiosqlite._backend import AiosqliteBackend, AiosqliteExecutor
+from asyncpg_trek.aiosqlite._fleet import FleetResult, migrate_fleet
+from asyncpg_trek.aiosqlite._profiler import AiosqliteProfiler, ProfilingConnection
+from asyncpg_trek.aiosqlite._synthetic import AiosqliteSyntheticData
+
+__all__ = [
+    "AiosqliteBackend",
+    "AiosqliteExecutor",
+    "AiosqliteProfiler",
+    "ProfilingConnection",
+    "AiosqliteSyntheticData",
+    "migrate_fleet",
+    "FleetResult",
+]
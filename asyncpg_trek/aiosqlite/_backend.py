@@ -0,0 +1,182 @@
+import pathlib
+import re
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+import aiosqlite
+
+from asyncpg_trek._tracks import DEFAULT_TABLE, table_for_track
+from asyncpg_trek._types import Operation
+
+CREATE_TABLE = """\
+CREATE TABLE IF NOT EXISTS "{table}" (
+    id SERIAL PRIMARY KEY,
+    from_revision TEXT,
+    to_revision TEXT,
+    timestamp TIMESTAMP NOT NULL DEFAULT current_timestamp,
+    duration REAL,
+    phase TEXT
+)"""
+CREATE_INDEX = """\
+CREATE INDEX IF NOT EXISTS "{table}_timestamp_idx" ON "{table}"(timestamp);
+"""
+
+GET_CURRENT_REVISION = """\
+SELECT to_revision
+FROM "{table}"
+WHERE $1 IS NULL OR phase IS NULL OR phase = $1
+ORDER BY rowid DESC
+LIMIT 1
+"""
+
+RECORD_REVISION = """\
+INSERT INTO "{table}"(from_revision, to_revision, phase)
+VALUES ($1, $2, $3)
+"""
+
+# columns missing from tables created by older versions
+ADDED_COLUMNS = {"duration": "REAL", "phase": "TEXT"}
+ADD_COLUMN = """\
+ALTER TABLE "{table}" ADD COLUMN {column} {type}
+"""
+
+RECORD_DURATION = """\
+UPDATE "{table}"
+SET duration = $1
+WHERE rowid = (SELECT max(rowid) FROM "{table}")
+"""
+
+GET_DURATIONS = """\
+SELECT from_revision, to_revision, duration
+FROM "{table}"
+WHERE duration IS NOT NULL
+ORDER BY rowid
+"""
+
+# PRAGMAs can't take parameters so names and values are validated instead
+PRAGMA_NAME_PATT = re.compile(r"^\w+$")
+PRAGMA_VALUE_PATT = re.compile(r"^-?\w+$")
+
+
+def _check_pragma(name: str, value: str) -> None:
+    if not PRAGMA_NAME_PATT.match(name) or not PRAGMA_VALUE_PATT.match(value):
+        raise ValueError(f"Invalid PRAGMA {name} = {value}")
+
+
+class AiosqliteExecutor:
+    def __init__(
+        self,
+        connection: aiosqlite.Connection,
+        table: str = DEFAULT_TABLE,
+        pragmas: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.connection = connection
+        self.table = table
+        self.pragmas = pragmas or {}
+
+    async def create_table_idempotent(self) -> None:
+        await self.connection.execute(CREATE_TABLE.format(table=self.table))  # type: ignore
+        await self.connection.execute(CREATE_INDEX.format(table=self.table))
+        info = await _fetchall(self.connection, f'PRAGMA table_info("{self.table}")')
+        existing = {column[1] for column in info}
+        for column, type_ in ADDED_COLUMNS.items():
+            if column not in existing:
+                await self.connection.execute(
+                    ADD_COLUMN.format(table=self.table, column=column, type=type_)
+                )
+
+    async def get_current_revision(self, phase: Optional[str] = None) -> Optional[str]:
+        async with self.connection.execute(
+            GET_CURRENT_REVISION.format(table=self.table), (phase,)
+        ) as cursor:
+            row = await cursor.fetchone()
+            if row:
+                return row[0]  # type: ignore
+            return None
+
+    async def record_migration(
+        self,
+        from_revision: Optional[str],
+        to_revision: Optional[str],
+        phase: Optional[str] = None,
+    ) -> None:
+        await self.connection.execute(RECORD_REVISION.format(table=self.table), (from_revision, to_revision, phase))  # type: ignore
+
+    async def record_duration(self, seconds: float) -> None:
+        await self.connection.execute(RECORD_DURATION.format(table=self.table), (seconds,))  # type: ignore
+
+    async def get_durations(self) -> Mapping[Tuple[str, str], float]:
+        rows = await _fetchall(self.connection, GET_DURATIONS.format(table=self.table))
+        # later rows overwrite earlier ones
+        return {(row[0], row[1]): row[2] for row in rows}
+
+    async def execute_operation(
+        self, operation: Operation[aiosqlite.Connection]
+    ) -> None:
+        await operation(self.connection)
+
+    def apply_settings(self, settings: Mapping[str, str]) -> AsyncContextManager[None]:
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[None]:
+            previous: Dict[str, str] = {}
+            try:
+                for name, value in {**self.pragmas, **settings}.items():
+                    _check_pragma(name, value)
+                    async with self.connection.execute(f"PRAGMA {name}") as cursor:
+                        row = await cursor.fetchone()
+                    await self.connection.execute(f"PRAGMA {name} = {value}")
+                    if row is not None:
+                        previous[name] = str(row[0])
+                yield
+            finally:
+                # PRAGMAs are not transactional so they must always be restored
+                for name, old in previous.items():
+                    await self.connection.execute(f"PRAGMA {name} = {old}")
+
+        return cm()
+
+
+class AiosqliteBackend:
+    def __init__(
+        self,
+        connection: aiosqlite.Connection,
+        track: Optional[str] = None,
+        pragmas: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.connection = connection
+        self.track = track
+        self.table = table_for_track(track)
+        # defaults for every migration, e.g. {"cache_size": "-262144"}
+        self.pragmas = pragmas or {}
+
+    def connect(self) -> AsyncContextManager[AiosqliteExecutor]:
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[AiosqliteExecutor]:
+            yield AiosqliteExecutor(self.connection, self.table, self.pragmas)
+
+        return cm()
+
+    def prepare_operation_from_sql_file(
+        self, path: pathlib.Path
+    ) -> Operation[aiosqlite.Connection]:
+        async def operation(connection: aiosqlite.Connection) -> None:
+            with open(path) as f:
+                query = f.read()
+
+            await connection.execute(query)  # type: ignore
+
+        return operation
+
+
+async def _fetchall(connection: aiosqlite.Connection, query: str) -> List[Any]:
+    async with connection.execute(query) as cursor:
+        return list(await cursor.fetchall())
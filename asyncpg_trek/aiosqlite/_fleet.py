@@ -0,0 +1,200 @@
+import asyncio
+import multiprocessing
+import pathlib
+import sqlite3
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import (
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import aiosqlite
+
+from asyncpg_trek._collect import collect_migrations_from_filesystem
+from asyncpg_trek._run import execute, find_plan, get_current_revision
+from asyncpg_trek._solver import build_migration_graph
+from asyncpg_trek._types import INITIAL_REVISION, Direction, Migration, Phase, Revision
+from asyncpg_trek.aiosqlite._backend import AiosqliteBackend
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FleetResult:
+    # databases that were migrated, mapped to the revision they started at
+    migrated: Mapping[str, Revision] = field(default_factory=dict)
+    # databases that were already at the target revision
+    skipped: Collection[str] = ()
+    # formatted tracebacks, so that results can be sent between processes
+    failures: Mapping[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class _FleetJob:
+    directory: pathlib.Path
+    target_revision: Revision
+    direction: Direction
+    track: Optional[str]
+    pragmas: Optional[Mapping[str, str]]
+    concurrency: int
+    phase: Optional[Phase]
+
+
+async def _current_revision(
+    backend: AiosqliteBackend, phase: Optional[Phase]
+) -> Revision:
+    async with backend.connect() as exec:
+        try:
+            return await get_current_revision(exec, phase)
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            return INITIAL_REVISION
+
+
+async def _migrate_database(
+    path: str,
+    job: _FleetJob,
+    find_path: Callable[
+        [Revision, Revision], Sequence[Migration[aiosqlite.Connection]]
+    ],
+) -> Optional[Revision]:
+    async with aiosqlite.connect(path) as connection:
+        backend = AiosqliteBackend(connection, job.track, job.pragmas)
+        current = await _current_revision(backend, job.phase)
+        if current == job.target_revision:
+            return None
+        async with backend.connect() as exec:
+            await exec.create_table_idempotent()
+            planned = await find_plan(
+                exec, find_path, current, job.target_revision, job.phase
+            )
+        await execute(backend, planned)
+        await connection.commit()
+    return current
+
+
+async def _migrate_databases(databases: Sequence[str], job: _FleetJob) -> FleetResult:
+    # operations created from SQL files don't hold on to the backend's
+    # connection, they are passed the connection of each database when run
+    async with aiosqlite.connect(":memory:") as scratch:
+        migrations = collect_migrations_from_filesystem(
+            job.directory, AiosqliteBackend(scratch, job.track)
+        )
+    graph = build_migration_graph(job.direction, migrations)
+    # databases at the same revision share the same path
+    paths: Dict[
+        Tuple[Revision, Revision], Sequence[Migration[aiosqlite.Connection]]
+    ] = {}
+
+    def find_path(
+        current: Revision, target: Revision
+    ) -> Sequence[Migration[aiosqlite.Connection]]:
+        if (current, target) not in paths:
+            paths[current, target] = graph.find_path(current, target)
+        return paths[current, target]
+
+    semaphore = asyncio.Semaphore(job.concurrency)
+    migrated: Dict[str, Revision] = {}
+    skipped: List[str] = []
+    failures: Dict[str, str] = {}
+
+    async def migrate(path: str) -> None:
+        async with semaphore:
+            try:
+                current = await _migrate_database(path, job, find_path)
+            except Exception:
+                logger.exception(f"Failed to migrate {path}")
+                failures[path] = traceback.format_exc()
+                return
+        if current is None:
+            skipped.append(path)
+        else:
+            migrated[path] = current
+
+    await asyncio.gather(*(migrate(path) for path in databases))
+    return FleetResult(migrated, skipped, failures)
+
+
+def _migrate_databases_in_process(
+    databases: Sequence[str], job: _FleetJob
+) -> FleetResult:
+    return asyncio.run(_migrate_databases(databases, job))
+
+
+async def migrate_fleet(
+    databases: Iterable[Union[str, pathlib.Path]],
+    directory: Union[str, pathlib.Path],
+    target_revision: str,
+    direction: Direction = Direction.up,
+    track: Optional[str] = None,
+    pragmas: Optional[Mapping[str, str]] = None,
+    concurrency: int = 16,
+    processes: Optional[int] = None,
+    phase: Optional[Phase] = None,
+) -> FleetResult:
+    """Migrate many sqlite database files to the same revision.
+
+    Migrations are collected once and the path from each distinct starting
+    revision is only solved once. Databases already at the target revision
+    are skipped after reading their current revision.
+    Up to `concurrency` databases are migrated at a time, each on its own
+    aiosqlite thread. If `processes` is given the databases are split between
+    that many worker processes instead, each migrating up to `concurrency`
+    databases at a time, so that Python migrations can use more than one core.
+    Workers are spawned rather than forked, so they load the migrations
+    afresh instead of inheriting the caller's threads and event loop.
+
+    Each database is migrated and committed independently, a failure in one
+    of them is reported in `FleetResult.failures` and does not affect the rest.
+    If a `phase` is given only migrations of that phase are run, see `plan()`.
+    """
+    if phase is not None and direction is not Direction.up:
+        raise ValueError("Phases can only be used to migrate up")
+    paths = [str(database) for database in databases]
+    job = _FleetJob(
+        directory=pathlib.Path(directory),
+        target_revision=target_revision,
+        direction=direction,
+        track=track,
+        pragmas=pragmas,
+        concurrency=concurrency,
+        phase=phase,
+    )
+    if processes is None or len(paths) <= 1:
+        result = await _migrate_databases(paths, job)
+    else:
+        chunks = [paths[i::processes] for i in range(processes) if paths[i::processes]]
+        loop = asyncio.get_running_loop()
+        # forking a process with a running event loop and threads is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(len(chunks), mp_context=ctx) as pool:
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        pool, _migrate_databases_in_process, chunk, job
+                    )
+                    for chunk in chunks
+                )
+            )
+        result = FleetResult(
+            migrated={k: v for r in results for k, v in r.migrated.items()},
+            skipped=[path for r in results for path in r.skipped],
+            failures={k: v for r in results for k, v in r.failures.items()},
+        )
+    logger.info(
+        f"Migrated {len(result.migrated)} databases, skipped {len(result.skipped)}"
+        f" and failed to migrate {len(result.failures)}"
+    )
+    return result
@@ -0,0 +1,61 @@
+import time
+from typing import Any, Iterable, Optional, cast
+
+import aiosqlite
+from aiosqlite.context import contextmanager
+
+from asyncpg_trek._profile import StatementRecorder
+
+
+def _rowcount(cursor: aiosqlite.Cursor) -> Optional[int]:
+    # sqlite reports -1 for statements that don't modify rows
+    return None if cursor.rowcount < 0 else cursor.rowcount
+
+
+class ProfilingConnection:
+    """A proxy for aiosqlite.Connection that reports every statement executed
+    through execute(), executemany() and executescript() to a StatementRecorder.
+    """
+
+    def __init__(
+        self, connection: aiosqlite.Connection, recorder: StatementRecorder
+    ) -> None:
+        self._connection = connection
+        self._recorder = recorder
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    @contextmanager
+    async def execute(
+        self, sql: str, parameters: Optional[Iterable[Any]] = None
+    ) -> aiosqlite.Cursor:
+        start = time.monotonic()
+        cursor = await self._connection.execute(sql, parameters)
+        self._recorder.record(sql, time.monotonic() - start, rows=_rowcount(cursor))
+        return cursor
+
+    @contextmanager
+    async def executemany(
+        self, sql: str, parameters: Iterable[Iterable[Any]]
+    ) -> aiosqlite.Cursor:
+        start = time.monotonic()
+        cursor = await self._connection.executemany(sql, parameters)
+        self._recorder.record(sql, time.monotonic() - start, rows=_rowcount(cursor))
+        return cursor
+
+    @contextmanager
+    async def executescript(self, sql_script: str) -> aiosqlite.Cursor:
+        start = time.monotonic()
+        cursor = await self._connection.executescript(sql_script)
+        self._recorder.record(sql_script, time.monotonic() - start)
+        return cursor
+
+
+class AiosqliteProfiler:
+    """Record every statement issued by migrations, pass this to `execute()`"""
+
+    def instrument(
+        self, connection: aiosqlite.Connection, recorder: StatementRecorder
+    ) -> aiosqlite.Connection:
+        return cast(aiosqlite.Connection, ProfilingConnection(connection, recorder))
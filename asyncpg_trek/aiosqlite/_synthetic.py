@@ -0,0 +1,194 @@
+import sqlite3
+from contextlib import asynccontextmanager
+from logging import getLogger
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Collection,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+import aiosqlite
+
+from asyncpg_trek._tracks import DEFAULT_TABLE
+from asyncpg_trek.aiosqlite._backend import _fetchall
+
+logger = getLogger(__name__)
+
+LIST_TABLES = """\
+SELECT name
+FROM sqlite_master
+WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'
+"""
+
+POPULATE = """\
+WITH RECURSIVE g(n) AS (SELECT ? UNION ALL SELECT n + 1 FROM g WHERE n < ?)
+INSERT INTO {table} ({columns}) SELECT {values} FROM g
+"""
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _synthetic_value(declared_type: str) -> str:
+    # an expression producing a value for the n-th synthetic row,
+    # based on sqlite's rules for determining column affinity
+    type_ = declared_type.upper()
+    if "INT" in type_:
+        return "n"
+    if "CHAR" in type_ or "CLOB" in type_ or "TEXT" in type_:
+        return "CAST(n AS TEXT)"
+    if "BLOB" in type_ or not type_:
+        return "randomblob(16)"
+    if "REAL" in type_ or "FLOA" in type_ or "DOUB" in type_:
+        return "n * 1.5"
+    if "BOOL" in type_:
+        return "n % 2"
+    if "DATE" in type_ or "TIME" in type_:
+        return "datetime('now', '-' || n || ' seconds')"
+    return "n"
+
+
+# authorizer actions, statements are authorized when they are prepared
+# actions passing the table as their first argument
+TABLE_ACTIONS = {
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_INSERT,
+    sqlite3.SQLITE_UPDATE,
+    sqlite3.SQLITE_DELETE,
+    sqlite3.SQLITE_DROP_TABLE,
+}
+# actions passing the table as their second argument
+SCHEMA_ACTIONS = {
+    sqlite3.SQLITE_CREATE_INDEX,
+    sqlite3.SQLITE_DROP_INDEX,
+    sqlite3.SQLITE_ALTER_TABLE,
+}
+
+
+class AiosqliteSyntheticData:
+    """Fill tables with generated rows for `load_test()`.
+
+    Rows are generated with a recursive CTE inside sqlite.
+    Columns with defaults and INTEGER PRIMARY KEY columns are left to sqlite
+    and single column foreign keys reference rows of the referenced table,
+    which is filled first. Tables with multi-column foreign keys are left alone,
+    as are the `bookkeeping_tables` recording migrations, which must include
+    `migrations_<track>` for every track in use.
+    """
+
+    def __init__(self, bookkeeping_tables: Collection[str] = (DEFAULT_TABLE,)) -> None:
+        self.bookkeeping_tables = set(bookkeeping_tables)
+
+    async def populate(
+        self, connection: aiosqlite.Connection, rows: int
+    ) -> Dict[str, int]:
+        tables = [
+            row[0]
+            for row in await _fetchall(connection, LIST_TABLES)
+            if row[0] not in self.bookkeeping_tables
+        ]
+        foreign_keys = {
+            table: await _fetchall(
+                connection, f"PRAGMA foreign_key_list({_quote(table)})"
+            )
+            for table in tables
+        }
+        # referenced tables are filled first, cycles are broken arbitrarily
+        order: List[str] = []
+        visited: Set[str] = set()
+
+        def visit(table: str) -> None:
+            if table in visited or table not in foreign_keys:
+                return
+            visited.add(table)
+            for fk in foreign_keys[table]:
+                visit(fk[2])
+            order.append(table)
+
+        for table in tables:
+            visit(table)
+        return {
+            table: await self._populate_table(
+                connection, table, foreign_keys[table], rows
+            )
+            for table in order
+        }
+
+    def touched_tables(
+        self, connection: aiosqlite.Connection
+    ) -> AsyncContextManager[Set[str]]:
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[Set[str]]:
+            touched: Set[str] = set()
+
+            def authorizer(
+                action: int, arg1: Optional[str], arg2: Optional[str], *_: Any
+            ) -> int:
+                if action in TABLE_ACTIONS and arg1 is not None:
+                    touched.add(arg1)
+                elif action in SCHEMA_ACTIONS and arg2 is not None:
+                    touched.add(arg2)
+                return sqlite3.SQLITE_OK
+
+            await connection.set_authorizer(authorizer)
+            try:
+                yield touched
+            finally:
+                await connection.set_authorizer(None)
+
+        return cm()
+
+    async def _populate_table(
+        self,
+        connection: aiosqlite.Connection,
+        table: str,
+        foreign_keys: List[Any],
+        rows: int,
+    ) -> int:
+        name = _quote(table)
+        ((existing,),) = await _fetchall(connection, f"SELECT count(*) FROM {name}")
+        if existing >= rows:
+            return existing  # type: ignore[no-any-return]
+        # foreign_key_list rows are (id, seq, table, from, to, ...)
+        if any(fk[1] > 0 for fk in foreign_keys):
+            logger.warning(f"Not populating {name}, it has a multi-column foreign key")
+            return existing  # type: ignore[no-any-return]
+        fk_by_column = {fk[3]: fk for fk in foreign_keys}
+        # table_info rows are (cid, name, type, notnull, dflt_value, pk)
+        info = await _fetchall(connection, f"PRAGMA table_info({name})")
+        pk_columns = [column for column in info if column[5]]
+        columns: List[str] = []
+        values: List[str] = []
+        for _, column, type_, _, default, pk in info:
+            if column in fk_by_column:
+                fk = fk_by_column[column]
+                ref_table = _quote(fk[2])
+                ref_column = "rowid" if fk[4] is None else _quote(fk[4])
+                value = (
+                    f"(SELECT {ref_column} FROM {ref_table} WHERE rowid >="
+                    f" 1 + n % (SELECT max(rowid) FROM {ref_table}) LIMIT 1)"
+                )
+            elif default is not None:
+                continue
+            elif pk and len(pk_columns) == 1 and type_.upper() == "INTEGER":
+                # an alias for the rowid
+                continue
+            else:
+                value = _synthetic_value(type_)
+            columns.append(_quote(column))
+            values.append(value)
+        if not values:
+            logger.warning(f"Not populating {name}, it has no columns to fill")
+            return existing  # type: ignore[no-any-return]
+        query = POPULATE.format(
+            table=name, columns=", ".join(columns), values=", ".join(values)
+        )
+        logger.debug(f"Populating {name} with {rows - existing} rows")
+        await connection.execute(query, (existing + 1, rows))
+        return rows
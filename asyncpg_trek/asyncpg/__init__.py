@@ -0,0 +1,31 @@
+from asyncpg_trek.asyncpg._analyzer import AsyncpgAnalyzer
+from asyncpg_trek.asyncpg._backend import (
+    AsyncpgBackend,
+    AsyncpgExecutor,
+    revision_channel,
+)
+from asyncpg_trek.asyncpg._governor import ReplicationGovernor, ReplicationSample
+from asyncpg_trek.asyncpg._preflight import PreflightError, PreflightIssue, preflight
+from asyncpg_trek.asyncpg._profiler import AsyncpgProfiler, ProfilingConnection
+from asyncpg_trek.asyncpg._progress import AsyncpgProgressMonitor, ProgressReport
+from asyncpg_trek.asyncpg._synthetic import AsyncpgSyntheticData
+from asyncpg_trek.asyncpg._watcher import RevisionWatcher, RevisionWatcherError
+
+__all__ = [
+    "AsyncpgBackend",
+    "AsyncpgExecutor",
+    "revision_channel",
+    "ReplicationGovernor",
+    "ReplicationSample",
+    "AsyncpgProfiler",
+    "ProfilingConnection",
+    "AsyncpgSyntheticData",
+    "preflight",
+    "PreflightError",
+    "PreflightIssue",
+    "AsyncpgAnalyzer",
+    "AsyncpgProgressMonitor",
+    "ProgressReport",
+    "RevisionWatcher",
+    "RevisionWatcherError",
+]
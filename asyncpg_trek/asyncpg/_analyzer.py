@@ -0,0 +1,186 @@
+import asyncio
+import time
+from logging import getLogger
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+import asyncpg  # type: ignore
+
+from asyncpg_trek._tracks import DEFAULT_TABLE
+from asyncpg_trek.asyncpg._backend import SET_LOCAL
+
+logger = getLogger(__name__)
+
+MODS_SINCE_ANALYZE = """\
+SELECT relid, n_mod_since_analyze FROM pg_stat_user_tables;
+"""
+
+# changes made by the current transaction, which only show up in
+# pg_stat_user_tables.n_mod_since_analyze once it has committed
+TRANSACTION_MODS = """\
+SELECT
+    relid,
+    relname,
+    quote_ident(schemaname) || '.' || quote_ident(relname) AS name,
+    n_tup_ins + n_tup_upd + n_tup_del AS n_mod
+FROM pg_stat_xact_user_tables
+WHERE n_tup_ins + n_tup_upd + n_tup_del > 0;
+"""
+
+LIST_INDEXES = """\
+SELECT
+    i.indexrelid,
+    quote_ident(n.nspname) || '.' || quote_ident(c.relname) AS name
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE i.indisvalid
+    AND n.nspname <> 'information_schema'
+    AND n.nspname NOT LIKE 'pg\\_%';
+"""
+
+PREWARM = "SELECT pg_prewarm($1::regclass)"
+HAS_PG_PREWARM = (
+    "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm')"
+)
+
+
+class AsyncpgAnalyzer:
+    """Refresh planner statistics for the tables a plan changed, and optionally
+    load the indexes it created into shared buffers, once the plan committed.
+
+    Tables are found by adding the changes made by the migration transaction
+    to their `n_mod_since_analyze` from before the plan ran, tables with the
+    most pending changes being analyzed first. `ANALYZE` and `pg_prewarm()`
+    are run on up to `concurrency` connections from `pool` and work that
+    doesn't fit in `time_budget` seconds is skipped, as is anything that
+    fails since the plan has already been committed.
+    Changes made by Python migrations through other connections are not seen,
+    nor are changes to the `bookkeeping_tables` recording migrations.
+
+    What was done by the last `execute()` is available in `analyzed`,
+    `prewarmed` and `skipped`.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        concurrency: int = 4,
+        prewarm: bool = False,
+        time_budget: Optional[float] = None,
+        min_changes: int = 1,
+        bookkeeping_tables: Collection[str] = (DEFAULT_TABLE,),
+    ) -> None:
+        self.pool = pool
+        self.concurrency = concurrency
+        self.prewarm = prewarm
+        self.time_budget = time_budget
+        # tables with fewer changes by the plan are left to autovacuum
+        self.min_changes = min_changes
+        self.bookkeeping_tables = set(bookkeeping_tables)
+        self._mods_before: Dict[int, int] = {}
+        self._indexes_before: Set[int] = set()
+        self._tables: List[str] = []
+        self._indexes: List[str] = []
+        self.analyzed: List[str] = []
+        self.prewarmed: List[str] = []
+        self.skipped: List[str] = []
+
+    async def before_plan(self, connection: asyncpg.Connection) -> None:
+        self._mods_before = {
+            row["relid"]: row["n_mod_since_analyze"]
+            for row in await connection.fetch(MODS_SINCE_ANALYZE)  # type: ignore
+        }
+        self._indexes_before = {
+            row["indexrelid"] for row in await connection.fetch(LIST_INDEXES)  # type: ignore
+        }
+
+    async def after_plan(self, connection: asyncpg.Connection) -> None:
+        pending: List[Tuple[int, str]] = []
+        for row in await connection.fetch(TRANSACTION_MODS):  # type: ignore
+            if (
+                row["n_mod"] < self.min_changes
+                or row["relname"] in self.bookkeeping_tables
+            ):
+                continue
+            before = self._mods_before.get(row["relid"], 0)
+            pending.append((before + row["n_mod"], row["name"]))
+        pending.sort(reverse=True)
+        self._tables = [name for _, name in pending]
+        self._indexes = [
+            row["name"]
+            for row in await connection.fetch(LIST_INDEXES)  # type: ignore
+            if row["indexrelid"] not in self._indexes_before
+        ]
+
+    async def _prewarm_available(self) -> bool:
+        if not self._indexes or not self.prewarm:
+            return False
+        try:
+            installed = await self.pool.fetchval(HAS_PG_PREWARM)  # type: ignore
+        except Exception:
+            logger.exception(
+                "Not prewarming new indexes, failed to check for pg_prewarm"
+            )
+            return False
+        if not installed:
+            logger.warning("Not prewarming new indexes, pg_prewarm is not installed")
+            return False
+        return True
+
+    async def after_commit(self) -> None:
+        start = time.monotonic()
+        work = [("analyze", table) for table in self._tables]
+        if await self._prewarm_available():
+            work.extend(("prewarm", index) for index in self._indexes)
+        work.reverse()
+        self.analyzed, self.prewarmed, self.skipped = [], [], []
+
+        async def worker() -> None:
+            conn: asyncpg.Connection
+            async with self.pool.acquire() as conn:  # type: ignore
+                while work:
+                    kind, name = work.pop()
+                    left = None
+                    if self.time_budget is not None:
+                        left = self.time_budget - (time.monotonic() - start)
+                        if left <= 0:
+                            self.skipped.append(name)
+                            continue
+                    try:
+                        async with conn.transaction():  # type: ignore
+                            if left is not None:
+                                timeout = f"{max(int(left * 1000), 1)}ms"
+                                await conn.execute(SET_LOCAL, "statement_timeout", timeout)  # type: ignore
+                            if kind == "analyze":
+                                await conn.execute(f"ANALYZE {name}")  # type: ignore
+                            else:
+                                await conn.execute(PREWARM, name)  # type: ignore
+                    except asyncpg.QueryCanceledError:
+                        logger.warning(f"Ran out of time to {kind} {name}")
+                        self.skipped.append(name)
+                        continue
+                    except Exception:
+                        # the plan is committed, failing here would lose its result
+                        logger.exception(f"Failed to {kind} {name}")
+                        self.skipped.append(name)
+                        continue
+                    if kind == "analyze":
+                        self.analyzed.append(name)
+                    else:
+                        self.prewarmed.append(name)
+
+        results = await asyncio.gather(
+            *(worker() for _ in range(min(self.concurrency, len(work)))),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Analyzer worker failed", exc_info=result)
+        # left over if every worker failed to get a connection
+        self.skipped.extend(name for _, name in work)
+        if self.analyzed or self.prewarmed or self.skipped:
+            logger.info(
+                f"Analyzed {len(self.analyzed)} tables and prewarmed"
+                f" {len(self.prewarmed)} indexes in {time.monotonic() - start:.2f}s,"
+                f" skipped {len(self.skipped)}"
+            )
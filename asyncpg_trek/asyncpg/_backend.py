@@ -0,0 +1,171 @@
+import hashlib
+import pathlib
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Dict, Mapping, Optional, Tuple
+
+import asyncpg  # type: ignore
+
+from asyncpg_trek._tracks import DEFAULT_TABLE, table_for_track
+from asyncpg_trek._types import Operation
+
+CREATE_TABLE = """\
+CREATE SCHEMA IF NOT EXISTS "{schema}";
+CREATE TABLE IF NOT EXISTS "{schema}"."{table}" (
+    id SERIAL PRIMARY KEY,
+    from_revision TEXT,
+    to_revision TEXT,
+    timestamp TIMESTAMP NOT NULL DEFAULT current_timestamp,
+    duration DOUBLE PRECISION,
+    phase TEXT
+);
+CREATE INDEX IF NOT EXISTS "{table}_timestamp_idx" ON "{schema}"."{table}"(timestamp);
+"""
+
+# columns added to tables created by older versions, checked before altering
+# the table so that planning doesn't take an exclusive lock every time
+ADDED_COLUMNS = {"duration": "DOUBLE PRECISION", "phase": "TEXT"}
+GET_COLUMNS = """\
+SELECT attname
+FROM pg_attribute
+WHERE attrelid = $1::regclass AND attnum > 0 AND NOT attisdropped;
+"""
+ADD_COLUMN = """\
+ALTER TABLE "{schema}"."{table}" ADD COLUMN IF NOT EXISTS {column} {type}
+"""
+
+GET_CURRENT_REVISION = """\
+SELECT to_revision
+FROM "{schema}"."{table}"
+WHERE $1::text IS NULL OR phase IS NULL OR phase = $1
+ORDER BY id DESC
+LIMIT 1;
+"""
+
+RECORD_REVISION = """\
+INSERT INTO "{schema}"."{table}"(from_revision, to_revision, phase)
+VALUES ($1, $2, $3)
+"""
+
+# delivered once the migrations commit
+NOTIFY_REVISION = "SELECT pg_notify($1, $2)"
+
+RECORD_DURATION = """\
+UPDATE "{schema}"."{table}"
+SET duration = $1
+WHERE id = (SELECT max(id) FROM "{schema}"."{table}")
+"""
+
+GET_DURATIONS = """\
+SELECT DISTINCT ON (from_revision, to_revision) from_revision, to_revision, duration
+FROM "{schema}"."{table}"
+WHERE duration IS NOT NULL
+ORDER BY from_revision, to_revision, id DESC;
+"""
+
+GET_SETTING = "SELECT current_setting($1, true)"
+SET_LOCAL = "SELECT set_config($1, $2, true)"
+
+
+def revision_channel(schema: str, table: str = DEFAULT_TABLE) -> str:
+    """The channel new revisions of a schema's migrations table are sent on"""
+    channel = f"asyncpg_trek.{schema}.{table}"
+    # channel names are limited to 63 bytes
+    if len(channel.encode()) > 63:
+        channel = f"asyncpg_trek.{hashlib.sha1(channel.encode()).hexdigest()}"
+    return channel
+
+
+class AsyncpgExecutor:
+    def __init__(
+        self,
+        connection: asyncpg.Connection,
+        schema: str,
+        table: str = DEFAULT_TABLE,
+        settings: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.connection = connection
+        self.schema = schema
+        self.table = table
+        self.settings = settings or {}
+
+    async def create_table_idempotent(self) -> None:
+        await self.connection.execute(CREATE_TABLE.format(schema=self.schema, table=self.table))  # type: ignore
+        rows = await self.connection.fetch(GET_COLUMNS, f'"{self.schema}"."{self.table}"')  # type: ignore
+        existing = {row["attname"] for row in rows}
+        for column, type_ in ADDED_COLUMNS.items():
+            if column not in existing:
+                await self.connection.execute(ADD_COLUMN.format(schema=self.schema, table=self.table, column=column, type=type_))  # type: ignore
+
+    async def get_current_revision(self, phase: Optional[str] = None) -> Optional[str]:
+        return await self.connection.fetchval(GET_CURRENT_REVISION.format(schema=self.schema, table=self.table), phase)  # type: ignore
+
+    async def record_migration(
+        self,
+        from_revision: Optional[str],
+        to_revision: Optional[str],
+        phase: Optional[str] = None,
+    ) -> None:
+        await self.connection.execute(RECORD_REVISION.format(schema=self.schema, table=self.table), from_revision, to_revision, phase)  # type: ignore
+        await self.connection.execute(NOTIFY_REVISION, revision_channel(self.schema, self.table), to_revision)  # type: ignore
+
+    async def record_duration(self, seconds: float) -> None:
+        await self.connection.execute(RECORD_DURATION.format(schema=self.schema, table=self.table), seconds)  # type: ignore
+
+    async def get_durations(self) -> Mapping[Tuple[str, str], float]:
+        rows = await self.connection.fetch(GET_DURATIONS.format(schema=self.schema, table=self.table))  # type: ignore
+        return {(row[0], row[1]): row[2] for row in rows}
+
+    async def execute_operation(self, operation: Operation[asyncpg.Connection]) -> None:
+        await operation(self.connection)
+
+    def apply_settings(self, settings: Mapping[str, str]) -> AsyncContextManager[None]:
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[None]:
+            previous: Dict[str, Optional[str]] = {}
+            for name, value in {**self.settings, **settings}.items():
+                previous[name] = await self.connection.fetchval(GET_SETTING, name)  # type: ignore
+                await self.connection.execute(SET_LOCAL, name, value)  # type: ignore
+            yield
+            # settings are local to the transaction, so if the migration failed
+            # they are discarded when the transaction is rolled back
+            for name, old in previous.items():
+                await self.connection.execute(SET_LOCAL, name, old or "")  # type: ignore
+
+        return cm()
+
+
+class AsyncpgBackend:
+    def __init__(
+        self,
+        connection: asyncpg.Connection,
+        schema: str = "public",
+        track: Optional[str] = None,
+        settings: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.connection = connection
+        self.schema = schema
+        self.track = track
+        self.table = table_for_track(track)
+        # defaults for every migration, e.g. {"maintenance_work_mem": "1GB"}
+        self.settings = settings or {}
+
+    def connect(self) -> AsyncContextManager[AsyncpgExecutor]:
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[AsyncpgExecutor]:
+            async with self.connection.transaction(isolation="serializable"):  # type: ignore
+                yield AsyncpgExecutor(
+                    self.connection, self.schema, self.table, self.settings
+                )
+
+        return cm()
+
+    def prepare_operation_from_sql_file(
+        self, path: pathlib.Path
+    ) -> Operation[asyncpg.Connection]:
+        async def operation(connection: asyncpg.Connection) -> None:
+            with open(path) as f:
+                query = f.read()
+
+            await connection.execute(query)  # type: ignore
+
+        return operation
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Optional, Tuple
+
+import asyncpg  # type: ignore
+
+logger = getLogger(__name__)
+
+REPLICATION_STATUS = """\
+SELECT
+    pg_wal_lsn_diff(pg_current_wal_insert_lsn(), '0/0')::bigint AS wal_position,
+    (
+        SELECT extract(epoch FROM max(replay_lag))::float8
+        FROM pg_stat_replication
+    ) AS replay_lag;
+"""
+
+
+@dataclass(frozen=True)
+class ReplicationSample:
+    # seconds the slowest streaming replica is behind on replay
+    # None if there are no replicas or they are fully caught up
+    replay_lag: Optional[float]
+    # bytes of WAL generated per second since the previous sample
+    # None for the first sample
+    wal_rate: Optional[float]
+
+
+class ReplicationGovernor:
+    """Pause migrations while replicas are lagging or WAL is generated too quickly.
+
+    Pass this to `execute()` to sample replication state before every migration.
+    Python migrations that write in batches can also call `throttle()`
+    themselves between batches.
+    Note that waiting happens inside the migration's transaction, so any locks
+    taken by earlier migrations are held while throttled. To bound that,
+    migrations go ahead anyway once a single wait reaches `max_wait` seconds.
+
+    Reading `replay_lag` requires superuser or the `pg_monitor` role,
+    otherwise Postgres reports it as NULL and the lag threshold never triggers.
+    """
+
+    def __init__(
+        self,
+        max_replay_lag: Optional[float] = None,
+        max_wal_rate: Optional[float] = None,
+        poll_interval: float = 1.0,
+        max_wait: float = 60.0,
+    ) -> None:
+        self.max_replay_lag = max_replay_lag
+        self.max_wal_rate = max_wal_rate
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        # total seconds spent throttled over the lifetime of this governor
+        self.throttled = 0.0
+        self._last_position: Optional[Tuple[float, int]] = None
+
+    async def sample(self, connection: asyncpg.Connection) -> ReplicationSample:
+        row = await connection.fetchrow(REPLICATION_STATUS)  # type: ignore
+        now = time.monotonic()
+        position: int = row["wal_position"]
+        wal_rate: Optional[float] = None
+        if self._last_position is not None:
+            last_time, last_position = self._last_position
+            if now > last_time:
+                wal_rate = (position - last_position) / (now - last_time)
+        self._last_position = (now, position)
+        return ReplicationSample(replay_lag=row["replay_lag"], wal_rate=wal_rate)
+
+    def should_throttle(self, sample: ReplicationSample) -> bool:
+        if (
+            self.max_replay_lag is not None
+            and sample.replay_lag is not None
+            and sample.replay_lag > self.max_replay_lag
+        ):
+            return True
+        if (
+            self.max_wal_rate is not None
+            and sample.wal_rate is not None
+            and sample.wal_rate > self.max_wal_rate
+        ):
+            return True
+        return False
+
+    async def throttle(self, connection: asyncpg.Connection) -> float:
+        start = time.monotonic()
+        waited = 0.0
+        sample = await self.sample(connection)
+        while self.should_throttle(sample):
+            if waited >= self.max_wait:
+                logger.warning(
+                    f"Replication still behind after waiting {waited:.2f}s"
+                    f" ({sample}), continuing anyway"
+                )
+                break
+            logger.debug(f"Throttling migrations: {sample}")
+            await asyncio.sleep(self.poll_interval)
+            waited = time.monotonic() - start
+            sample = await self.sample(connection)
+        self.throttled += waited
+        return waited
@@ -0,0 +1,173 @@
+import asyncio
+import inspect
+import pathlib
+import re
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Awaitable, Dict, List, Optional, Sequence, Tuple
+
+import asyncpg  # type: ignore
+
+from asyncpg_trek._types import Migration
+
+logger = getLogger(__name__)
+
+DOLLAR_QUOTE_PATT = re.compile(r"\$(?:[A-Za-z_]\w*)?\$")
+SQL_COMMENT_PATT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+# errors that may just mean the object is created by an earlier statement
+UNDEFINED_OBJECT_SQLSTATES = {"42P01", "42703", "42704", "42883", "3F000"}
+UNDEFINED_NAME_PATT = re.compile(r'"([^"]+)"|^function ([\w.]+)\(')
+# statements that give an object the name that follows them
+CREATING_PATT = (
+    r"\b(?:CREATE\s+(?:OR\s+REPLACE\s+)?"
+    r"(?:(?:TEMP|TEMPORARY|UNLOGGED|MATERIALIZED)\s+)?"
+    r"(?:TABLE|VIEW|FUNCTION|PROCEDURE|TYPE|SCHEMA|SEQUENCE)\s+"
+    r"(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"|ADD\s+(?:COLUMN\s+)?(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"|RENAME\s+(?:(?:COLUMN\s+)?\S+\s+)?TO\s+)"
+)
+
+
+def _split_statements(sql: str) -> List[Tuple[int, int, str]]:
+    """Split a SQL script into (line, offset, statement) tuples, where line
+    is the 1-based line the statement's text starts on.
+    """
+    statements: List[Tuple[int, int, str]] = []
+    start = i = 0
+    while i < len(sql):
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end + 1
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = len(sql) if end == -1 else end + 2
+            continue
+        char = sql[i]
+        if char in "'\"":
+            end = i + 1
+            while True:
+                end = sql.find(char, end)
+                if end == -1 or not sql.startswith(char, end + 1):
+                    break
+                # doubled quotes are escaped quotes
+                end += 2
+            i = len(sql) if end == -1 else end + 1
+            continue
+        match = DOLLAR_QUOTE_PATT.match(sql, i) if char == "$" else None
+        if match is not None:
+            end = sql.find(match.group(), match.end())
+            i = len(sql) if end == -1 else end + len(match.group())
+            continue
+        if char == ";":
+            statements.append((sql.count("\n", 0, start) + 1, start, sql[start:i]))
+            start = i + 1
+        i += 1
+    statements.append((sql.count("\n", 0, start) + 1, start, sql[start:]))
+    return [
+        (line, offset, statement)
+        for line, offset, statement in statements
+        if SQL_COMMENT_PATT.sub("", statement).strip()
+    ]
+
+
+def _defined_earlier(error: asyncpg.PostgresError, preceding: str) -> bool:
+    # the missing object is the first one named in the message, any others
+    # contain it, e.g. 'column "x" of relation "y" does not exist', which is
+    # also expected if "y" is (re)created with the column earlier
+    preceding = SQL_COMMENT_PATT.sub(" ", preceding)
+    for match in UNDEFINED_NAME_PATT.finditer(str(error)):
+        name = (match.group(1) or match.group(2)).rsplit(".", 1)[-1]
+        created = rf'{CREATING_PATT}(?:[\w"]+\.)?"?{re.escape(name)}"?(?![\w"])'
+        if re.search(created, preceding, re.IGNORECASE):
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class PreflightIssue:
+    path: pathlib.Path
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line}: {self.message}"
+
+
+class PreflightError(Exception):
+    def __init__(self, issues: Sequence[PreflightIssue]) -> None:
+        self.issues = issues
+        super().__init__("\n".join(str(issue) for issue in issues))
+
+
+async def _check_statement(
+    pool: asyncpg.Pool, path: pathlib.Path, line: int, statement: str, preceding: str
+) -> Optional[PreflightIssue]:
+    conn: asyncpg.Connection
+    async with pool.acquire() as conn:  # type: ignore
+        try:
+            # only parses (and for DML, analyzes) the statement without running it
+            await conn.prepare(statement)  # type: ignore
+        except asyncpg.PostgresError as e:
+            if e.sqlstate in UNDEFINED_OBJECT_SQLSTATES and _defined_earlier(
+                e, preceding
+            ):
+                logger.debug(f"Ignoring {e} at {path}:{line}, it is created earlier")
+                return None
+            position = getattr(e, "position", None)
+            if position:
+                line += statement[: int(position) - 1].count("\n")
+            else:
+                line += statement[: len(statement) - len(statement.lstrip())].count(
+                    "\n"
+                )
+            return PreflightIssue(path, line, str(e))
+    return None
+
+
+async def preflight(
+    plan: Sequence[Migration[asyncpg.Connection]], pool: asyncpg.Pool
+) -> None:
+    """Check a plan for errors before executing it, raising PreflightError
+    listing every problem found with its file and line.
+
+    Every statement of every SQL migration is parsed concurrently on
+    connections from `pool`, which can point at the database being migrated
+    or at a template database with the same schema. Nothing is executed.
+    Statements that reference tables or columns that don't exist yet are
+    only reported if nothing earlier in the plan creates them.
+    Python migrations are imported when the plan is made, here they are only
+    checked to define an async `run_migration`.
+    """
+    checks: List[Awaitable[Optional[PreflightIssue]]] = []
+    issues: List[PreflightIssue] = []
+    order: Dict[pathlib.Path, int] = {}
+    preceding = ""
+    for mig in plan:
+        if mig.path is None or mig.deferred:
+            continue
+        order[mig.path] = len(order)
+        text = mig.path.read_text()
+        if mig.path.suffix == ".py":
+            if not inspect.iscoroutinefunction(mig.operation):
+                code = getattr(mig.operation, "__code__", None)
+                issues.append(
+                    PreflightIssue(
+                        mig.path,
+                        1 if code is None else code.co_firstlineno,
+                        "run_migration must be an async function",
+                    )
+                )
+        else:
+            for line, offset, statement in _split_statements(text):
+                checks.append(
+                    _check_statement(
+                        pool, mig.path, line, statement, preceding + text[:offset]
+                    )
+                )
+        preceding += text
+    logger.info(f"Checking {len(checks)} statements")
+    issues.extend(issue for issue in await asyncio.gather(*checks) if issue)
+    if issues:
+        issues.sort(key=lambda issue: (order[issue.path], issue.line))
+        raise PreflightError(issues)
@@ -0,0 +1,150 @@
+import re
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional, Sequence
+
+import asyncpg  # type: ignore
+
+from asyncpg_trek._profile import StatementRecorder
+
+# statements that EXPLAIN accepts
+EXPLAINABLE = re.compile(
+    r"^\s*(SELECT|INSERT|UPDATE|DELETE|MERGE|WITH|VALUES|TABLE)\b", re.IGNORECASE
+)
+
+
+def _rows_from_status(status: str) -> Optional[int]:
+    # command tags look like "INSERT 0 5", "UPDATE 3" or "CREATE INDEX"
+    match = re.search(r"\b(\d+)$", status or "")
+    return int(match.group(1)) if match else None
+
+
+def _is_explainable(query: str) -> bool:
+    # EXPLAIN only accepts a single statement
+    return bool(EXPLAINABLE.match(query)) and ";" not in query.strip().rstrip(";")
+
+
+class ProfilingConnection:
+    """A proxy for asyncpg.Connection that reports every statement executed
+    through execute(), executemany() and fetch*() to a StatementRecorder.
+    """
+
+    def __init__(
+        self,
+        connection: asyncpg.Connection,
+        recorder: StatementRecorder,
+        explain_threshold: Optional[float] = None,
+    ) -> None:
+        self._connection = connection
+        self._recorder = recorder
+        self._explain_threshold = explain_threshold
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    async def _explain(
+        self, query: str, args: Sequence[Any], timeout: Optional[float]
+    ) -> str:
+        # EXPLAIN ANALYZE executes the statement so undo it afterwards
+        savepoint = self._connection.transaction()
+        await savepoint.start()
+        try:
+            rows = await self._connection.fetch(
+                f"EXPLAIN (ANALYZE, BUFFERS) {query}", *args, timeout=timeout
+            )
+        finally:
+            await savepoint.rollback()
+        return "\n".join(row[0] for row in rows)
+
+    async def _profile(
+        self,
+        method: Callable[..., Awaitable[Any]],
+        query: str,
+        args: Sequence[Any],
+        timeout: Optional[float],
+        count_rows: Callable[[Any], Optional[int]],
+    ) -> Any:
+        if self._explain_threshold is None or not _is_explainable(query):
+            start = time.monotonic()
+            result = await method(query, *args, timeout=timeout)
+            elapsed = time.monotonic() - start
+            self._recorder.record(query, elapsed, rows=count_rows(result))
+            return result
+        # run the statement in a savepoint so that if it turns out to be slow
+        # it can be explained starting from the same state it originally saw
+        savepoint = self._connection.transaction()
+        await savepoint.start()
+        try:
+            start = time.monotonic()
+            result = await method(query, *args, timeout=timeout)
+            elapsed = time.monotonic() - start
+        except BaseException:
+            await savepoint.rollback()
+            raise
+        plan: Optional[str] = None
+        if elapsed < self._explain_threshold:
+            await savepoint.commit()
+        else:
+            await savepoint.rollback()
+            plan = await self._explain(query, args, timeout)
+            result = await method(query, *args, timeout=timeout)
+        self._recorder.record(query, elapsed, rows=count_rows(result), plan=plan)
+        return result
+
+    async def execute(
+        self, query: str, *args: Any, timeout: Optional[float] = None
+    ) -> str:
+        return await self._profile(  # type: ignore[no-any-return]
+            self._connection.execute, query, args, timeout, _rows_from_status
+        )
+
+    async def executemany(
+        self,
+        command: str,
+        args: Iterable[Sequence[Any]],
+        *,
+        timeout: Optional[float] = None,
+    ) -> None:
+        start = time.monotonic()
+        await self._connection.executemany(command, args, timeout=timeout)
+        self._recorder.record(command, time.monotonic() - start)
+
+    async def fetch(
+        self, query: str, *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        return await self._profile(self._connection.fetch, query, args, timeout, len)
+
+    async def fetchrow(
+        self, query: str, *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        return await self._profile(
+            self._connection.fetchrow,
+            query,
+            args,
+            timeout,
+            lambda row: 0 if row is None else 1,
+        )
+
+    async def fetchval(
+        self, query: str, *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        return await self._profile(
+            self._connection.fetchval, query, args, timeout, lambda _: None
+        )
+
+
+class AsyncpgProfiler:
+    """Record every statement issued by migrations, pass this to `execute()`.
+
+    If `explain_threshold` is set, statements that take longer than that many
+    seconds are rolled back and run again under EXPLAIN (ANALYZE, BUFFERS).
+    Slow statements then execute up to three times, so this is intended for
+    rehearsals against a copy of production rather than for real deploys.
+    """
+
+    def __init__(self, explain_threshold: Optional[float] = None) -> None:
+        self.explain_threshold = explain_threshold
+
+    def instrument(
+        self, connection: asyncpg.Connection, recorder: StatementRecorder
+    ) -> asyncpg.Connection:
+        return ProfilingConnection(connection, recorder, self.explain_threshold)
@@ -0,0 +1,215 @@
+import asyncio
+import inspect
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from logging import getLogger
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import asyncpg  # type: ignore
+
+logger = getLogger(__name__)
+
+# (command, target, phase, done, total) of whatever the backend is doing,
+# target identifying the relation being worked on; each view only reports on
+# commands of one kind and some don't exist in older versions
+PROGRESS_QUERIES = {
+    "pg_stat_progress_create_index": """\
+SELECT
+    command,
+    -- index_relid is 0 until a non-concurrent build knows its index
+    relid::text || '/' || index_relid::text AS target,
+    phase,
+    CASE WHEN blocks_total > 0 THEN blocks_done ELSE tuples_done END AS done,
+    CASE WHEN blocks_total > 0 THEN blocks_total ELSE tuples_total END AS total
+FROM pg_stat_progress_create_index
+WHERE pid = $1;
+""",
+    "pg_stat_progress_cluster": """\
+SELECT
+    command,
+    relid::text AS target,
+    phase,
+    heap_blks_scanned AS done,
+    heap_blks_total AS total
+FROM pg_stat_progress_cluster
+WHERE pid = $1;
+""",
+    "pg_stat_progress_vacuum": """\
+SELECT
+    'VACUUM' AS command,
+    relid::text AS target,
+    phase,
+    CASE
+        WHEN phase = 'vacuuming heap' THEN heap_blks_vacuumed
+        ELSE heap_blks_scanned
+    END AS done,
+    heap_blks_total AS total
+FROM pg_stat_progress_vacuum
+WHERE pid = $1;
+""",
+    "pg_stat_progress_copy": """\
+SELECT
+    command,
+    relid::text AS target,
+    type AS phase,
+    bytes_processed AS done,
+    bytes_total AS total
+FROM pg_stat_progress_copy
+WHERE pid = $1;
+""",
+}
+
+LOCK_WAIT = """\
+SELECT wait_event, pg_blocking_pids(pid) AS blocked_by
+FROM pg_stat_activity
+WHERE pid = $1 AND wait_event_type = 'Lock';
+"""
+
+
+@dataclass(frozen=True)
+class ProgressReport:
+    # the backend running the migration
+    pid: int
+    # e.g. "CREATE INDEX", None if only waiting on a lock
+    command: Optional[str]
+    phase: Optional[str]
+    done: Optional[int] = None
+    total: Optional[int] = None
+    # of the current phase
+    percent: Optional[float] = None
+    # estimated seconds left in the current phase
+    eta: Optional[float] = None
+    # the kind of lock being waited on and the backends holding it
+    lock: Optional[str] = None
+    blocked_by: Sequence[int] = ()
+
+
+class AsyncpgProgressMonitor:
+    """Report on the progress of long running commands in migrations.
+
+    While `watch()` is active, pg_stat_progress_* views and lock waits of the
+    migrating connection are read every `interval` seconds from a connection
+    out of `pool` and reported to `callback`, which is only called while a
+    command that reports progress is running or the migration is blocked.
+    The ETA assumes the current phase keeps progressing at the rate it has
+    since it was first seen.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        callback: Callable[[ProgressReport], Any],
+        interval: float = 5.0,
+    ) -> None:
+        self.pool = pool
+        self.callback = callback
+        self.interval = interval
+        self._views = list(PROGRESS_QUERIES)
+        # (command, target, phase) -> (time, done) when the phase was first seen
+        self._phase_start: Dict[Tuple[str, str, str], Tuple[float, int]] = {}
+
+    async def _read_progress(
+        self, conn: asyncpg.Connection, pid: int
+    ) -> Optional[asyncpg.Record]:
+        for view in list(self._views):
+            try:
+                row = await conn.fetchrow(PROGRESS_QUERIES[view], pid)  # type: ignore
+            except asyncpg.UndefinedTableError:
+                logger.debug(f"{view} is not available")
+                self._views.remove(view)
+                continue
+            if row is not None:
+                return row  # type: ignore[no-any-return]
+        return None
+
+    def _eta(self, key: Tuple[str, str, str], done: int, total: int) -> Optional[float]:
+        now = time.monotonic()
+        start, start_done = self._phase_start.setdefault(key, (now, done))
+        if done < start_done:
+            # a new command on the same relation that can't be told apart
+            self._phase_start[key] = (now, done)
+            return None
+        if done == start_done or now <= start:
+            return None
+        rate = (done - start_done) / (now - start)
+        return max(total - done, 0) / rate
+
+    async def poll(
+        self, conn: asyncpg.Connection, pid: int
+    ) -> Optional[ProgressReport]:
+        """Read the progress of backend `pid` once, None if it is idle"""
+        row = await self._read_progress(conn, pid)
+        lock = await conn.fetchrow(LOCK_WAIT, pid)  # type: ignore
+        if row is None and lock is None:
+            return None
+        command = phase = None
+        done = total = None
+        percent = eta = None
+        if row is not None:
+            command, phase, done, total = (
+                row["command"],
+                row["phase"],
+                row["done"],
+                row["total"],
+            )
+            if total:
+                percent = 100 * done / total
+                eta = self._eta((command, row["target"], phase), done, total)
+        return ProgressReport(
+            pid=pid,
+            command=command,
+            phase=phase,
+            done=done,
+            total=total,
+            percent=percent,
+            eta=eta,
+            lock=None if lock is None else lock["wait_event"],
+            blocked_by=() if lock is None else list(lock["blocked_by"]),
+        )
+
+    async def _run(self, pid: int) -> None:
+        conn: asyncpg.Connection
+        async with self.pool.acquire() as conn:  # type: ignore
+            while True:
+                try:
+                    report = await self.poll(conn, pid)
+                    if report is not None:
+                        result = self.callback(report)
+                        if inspect.isawaitable(result):
+                            await result
+                except Exception:
+                    # a failing callback or query only costs this report
+                    logger.exception("Failed to report migration progress")
+                await asyncio.sleep(self.interval)
+
+    def watch(self, connection: asyncpg.Connection) -> AsyncContextManager[None]:
+        """Monitor `connection`, which should be the one the migrations run on"""
+
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[None]:
+            self._phase_start.clear()
+            task = asyncio.ensure_future(self._run(connection.get_server_pid()))
+            try:
+                yield
+            finally:
+                task.cancel()
+                # unlike awaiting the task this propagates only our own
+                # cancellation, not the one of the task
+                await asyncio.wait([task])
+                if not task.cancelled() and task.exception() is not None:
+                    # monitoring must never fail the migration
+                    logger.error(
+                        "Progress monitoring failed", exc_info=task.exception()
+                    )
+
+        return cm()
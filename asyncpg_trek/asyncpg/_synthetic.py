@@ -0,0 +1,229 @@
+from contextlib import asynccontextmanager
+from logging import getLogger
+from typing import (
+    AsyncContextManager,
+    AsyncIterator,
+    Collection,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+)
+
+import asyncpg  # type: ignore
+
+from asyncpg_trek._tracks import DEFAULT_TABLE
+
+logger = getLogger(__name__)
+
+LIST_TABLES = """\
+SELECT c.oid, n.nspname AS schema, c.relname AS name
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind IN ('r', 'p')
+    AND NOT c.relispartition
+    AND n.nspname <> 'information_schema'
+    AND n.nspname NOT LIKE 'pg\\_%';
+"""
+
+LIST_COLUMNS = """\
+SELECT
+    a.attname AS name,
+    format_type(a.atttypid, a.atttypmod) AS type,
+    t.typname AS type_name,
+    t.typcategory::text AS category,
+    a.attnotnull AS not_null,
+    a.atthasdef OR a.attidentity <> '' OR a.attgenerated <> '' AS has_default
+FROM pg_attribute a
+JOIN pg_type t ON t.oid = a.atttypid
+WHERE a.attrelid = $1 AND a.attnum > 0 AND NOT a.attisdropped
+ORDER BY a.attnum;
+"""
+
+LIST_FOREIGN_KEYS = """\
+SELECT
+    con.confrelid AS ref_oid,
+    cardinality(con.conkey) AS n_columns,
+    src.attname AS column_name,
+    quote_ident(ref_ns.nspname) || '.' || quote_ident(ref.relname) AS ref_table,
+    dst.attname AS ref_column
+FROM pg_constraint con
+JOIN pg_attribute src ON src.attrelid = con.conrelid AND src.attnum = con.conkey[1]
+JOIN pg_attribute dst ON dst.attrelid = con.confrelid AND dst.attnum = con.confkey[1]
+JOIN pg_class ref ON ref.oid = con.confrelid
+JOIN pg_namespace ref_ns ON ref_ns.oid = ref.relnamespace
+WHERE con.contype = 'f' AND con.conrelid = $1;
+"""
+
+# activity of the current transaction, so it includes uncommitted migrations
+TABLE_ACTIVITY = """\
+SELECT
+    schemaname || '.' || relname AS name,
+    seq_tup_read + coalesce(idx_tup_fetch, 0) + n_tup_ins + n_tup_upd + n_tup_del
+        AS activity
+FROM pg_stat_xact_user_tables;
+"""
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _synthetic_value(column: asyncpg.Record) -> Optional[str]:
+    # an expression producing a value for the n-th synthetic row
+    type_, type_name, category = column["type"], column["type_name"], column["category"]
+    if type_name == "int2":
+        return "(n % 32767)::int2"
+    if category == "N":
+        if "(" in type_:
+            # numeric(precision, scale) may not fit large values
+            return f"(n % 10)::{type_}"
+        return f"n::{type_}"
+    if category == "S":
+        return f"n::text::{type_}"
+    if category == "B":
+        return "n % 2 = 0"
+    if category == "D":
+        return f"(now() - n * interval '1 second')::{type_}"
+    if category == "T":
+        return f"(n * interval '1 second')::{type_}"
+    if category == "E":
+        labels = f"enum_range(NULL::{type_})"
+        return f"({labels})[(1 + n % cardinality({labels}))::int]"
+    if category == "A":
+        return f"'{{}}'::{type_}"
+    if type_name == "uuid":
+        return "md5(n::text)::uuid"
+    if type_name in ("json", "jsonb"):
+        return f"json_build_object('n', n)::{type_}"
+    if type_name == "bytea":
+        return "decode(md5(n::text), 'hex')"
+    return None
+
+
+class AsyncpgSyntheticData:
+    """Fill tables with generated rows for `load_test()`.
+
+    Rows are generated server side with INSERT ... SELECT FROM generate_series().
+    Columns with defaults are left to their defaults and single column foreign
+    keys reference rows sampled from the referenced table, which is filled first.
+    Tables with columns of unsupported types or multi-column foreign keys
+    are left alone, as are the `bookkeeping_tables` recording migrations,
+    which must include `migrations_<track>` for every track in use.
+    """
+
+    def __init__(
+        self,
+        fk_sample_size: int = 10_000,
+        bookkeeping_tables: Collection[str] = (DEFAULT_TABLE,),
+    ) -> None:
+        self.fk_sample_size = fk_sample_size
+        self.bookkeeping_tables = set(bookkeeping_tables)
+
+    async def populate(
+        self, connection: asyncpg.Connection, rows: int
+    ) -> Dict[str, int]:
+        tables = {
+            table["oid"]: table
+            for table in await connection.fetch(LIST_TABLES)  # type: ignore
+            if table["name"] not in self.bookkeeping_tables
+        }
+        foreign_keys = {
+            oid: await connection.fetch(LIST_FOREIGN_KEYS, oid)  # type: ignore
+            for oid in tables
+        }
+        # referenced tables are filled first, cycles are broken arbitrarily
+        order: List[int] = []
+        visited: Set[int] = set()
+
+        def visit(oid: int) -> None:
+            if oid in visited or oid not in tables:
+                return
+            visited.add(oid)
+            for fk in foreign_keys[oid]:
+                visit(fk["ref_oid"])
+            order.append(oid)
+
+        for oid in tables:
+            visit(oid)
+        return {
+            f"{tables[oid]['schema']}.{tables[oid]['name']}": await self._populate_table(
+                connection, oid, tables[oid], foreign_keys[oid], rows
+            )
+            for oid in order
+        }
+
+    def touched_tables(
+        self, connection: asyncpg.Connection
+    ) -> AsyncContextManager[Set[str]]:
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[Set[str]]:
+            touched: Set[str] = set()
+            before = dict(await connection.fetch(TABLE_ACTIVITY))  # type: ignore
+            yield touched
+            for name, activity in await connection.fetch(TABLE_ACTIVITY):  # type: ignore
+                if activity > before.get(name, 0):
+                    touched.add(name)
+
+        return cm()
+
+    async def _populate_table(
+        self,
+        connection: asyncpg.Connection,
+        oid: int,
+        table: asyncpg.Record,
+        foreign_keys: Sequence[asyncpg.Record],
+        rows: int,
+    ) -> int:
+        name = f"{_quote(table['schema'])}.{_quote(table['name'])}"
+        existing: int = await connection.fetchval(f"SELECT count(*) FROM {name}")  # type: ignore
+        if existing >= rows:
+            return existing
+        if any(fk["n_columns"] > 1 for fk in foreign_keys):
+            logger.warning(f"Not populating {name}, it has a multi-column foreign key")
+            return existing
+        fk_by_column = {fk["column_name"]: fk for fk in foreign_keys}
+        ctes: List[str] = []
+        columns: List[str] = []
+        values: List[str] = []
+        for column in await connection.fetch(LIST_COLUMNS, oid):  # type: ignore
+            fk = fk_by_column.get(column["name"])
+            if fk is not None:
+                alias = f"fk{len(ctes)}"
+                ref_column = _quote(fk["ref_column"])
+                ctes.append(
+                    f"{alias} AS (SELECT array_agg({ref_column}) AS a FROM"
+                    f" (SELECT {ref_column} FROM {fk['ref_table']}"
+                    f" LIMIT {int(self.fk_sample_size)}) s)"
+                )
+                value = f"{alias}.a[(1 + n % cardinality({alias}.a))::int]"
+            elif column["has_default"]:
+                continue
+            else:
+                generated = _synthetic_value(column)
+                if generated is None:
+                    if column["not_null"]:
+                        logger.warning(
+                            f"Not populating {name}, can't generate values"
+                            f" for {column['name']} {column['type']}"
+                        )
+                        return existing
+                    continue
+                value = generated
+            columns.append(_quote(column["name"]))
+            values.append(value)
+        query = (
+            (f"WITH {', '.join(ctes)} " if ctes else "")
+            + f"INSERT INTO {name}"
+            + (f" ({', '.join(columns)})" if columns else "")
+            + f" SELECT {', '.join(values)}"
+            + " FROM "
+            + ", ".join(
+                ["generate_series($1::int8, $2::int8) AS g(n)"]
+                + [f"fk{i}" for i in range(len(ctes))]
+            )
+        )
+        logger.debug(f"Populating {name} with {rows - existing} rows")
+        await connection.execute(query, existing + 1, rows)  # type: ignore
+        return rows
@@ -0,0 +1,182 @@
+import asyncio
+from logging import getLogger
+from typing import Any, Iterable, List, Optional, Tuple
+
+import asyncpg  # type: ignore
+
+from asyncpg_trek._tracks import table_for_track
+from asyncpg_trek._types import INITIAL_REVISION, Phase
+from asyncpg_trek.asyncpg._backend import revision_channel
+
+logger = getLogger(__name__)
+
+GET_REVISION_HISTORY = """\
+SELECT from_revision, to_revision
+FROM "{schema}"."{table}"
+WHERE $1::text IS NULL OR phase IS NULL OR phase = $1
+ORDER BY id;
+"""
+
+
+def _revision_path(history: Iterable[Tuple[str, str]]) -> List[str]:
+    # replay the (from, to) history to find the revisions between the
+    # initial revision and the current one, down migrations undoing up ones
+    path: List[str] = [INITIAL_REVISION]
+    for from_rev, to_rev in history:
+        if len(path) > 1 and path[-1] == from_rev and path[-2] == to_rev:
+            path.pop()
+        elif path[-1] == from_rev:
+            path.append(to_rev)
+        else:
+            # the history was edited by hand, trust the latest entry
+            path = [from_rev, to_rev]
+    return path
+
+
+class RevisionWatcherError(Exception):
+    """The watcher lost its connection or couldn't read the revision,
+    so it no longer knows the current revision.
+    """
+
+
+class RevisionWatcher:
+    """Keep track of the current revision of a database without polling.
+
+    A single connection LISTENs for the notifications sent when migrations
+    are recorded, so that reading the current revision or checking whether a
+    revision has been reached is an in-memory operation.
+    The connection should not be used for anything else while watching.
+    If it is closed, reading the revision and waiting for one raise
+    RevisionWatcherError.
+
+    If a `phase` is given the revision reached by that phase is tracked,
+    otherwise the revision both phases have reached, which is the contract
+    phase's as it can't get ahead of the expand phase.
+    """
+
+    def __init__(
+        self,
+        connection: asyncpg.Connection,
+        schema: str = "public",
+        track: Optional[str] = None,
+        phase: Optional[Phase] = None,
+    ) -> None:
+        self.connection = connection
+        self.schema = schema
+        self.table = table_for_track(track)
+        self.phase = phase
+        self.channel = revision_channel(schema, self.table)
+        self._path: List[str] = [INITIAL_REVISION]
+        self._changed = asyncio.Condition()
+        self._refreshing: Optional["asyncio.Future[None]"] = None
+        # whether a notification arrived since the last refresh started
+        self._dirty = False
+        self._listening = False
+        self._failure: Optional[RevisionWatcherError] = None
+        self._terminated = False
+
+    def _check(self) -> None:
+        if self._failure is not None:
+            raise self._failure
+
+    @property
+    def revision(self) -> Optional[str]:
+        """The current revision, None if no migrations have been applied"""
+        self._check()
+        return None if len(self._path) == 1 else self._path[-1]
+
+    def reached(self, revision: str) -> bool:
+        """Whether the database is at `revision` or a later revision"""
+        self._check()
+        return revision in self._path
+
+    async def _fail(self, failure: RevisionWatcherError) -> None:
+        if self._failure is None:
+            logger.error(str(failure), exc_info=failure.__cause__)
+            self._failure = failure
+        # wake up waiters so that they raise
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _on_termination(self, connection: asyncpg.Connection) -> None:
+        self._terminated = True
+        asyncio.ensure_future(
+            self._fail(RevisionWatcherError("The watcher's connection was closed"))
+        )
+
+    async def _refresh(self) -> None:
+        query = GET_REVISION_HISTORY.format(schema=self.schema, table=self.table)
+        try:
+            rows = await self.connection.fetch(  # type: ignore
+                query, (self.phase or Phase.contract).name
+            )
+        except asyncpg.UndefinedTableError:
+            rows = []
+        path = _revision_path((row[0], row[1]) for row in rows)
+        async with self._changed:
+            if path != self._path:
+                logger.info(f"Revision changed to {path[-1]}")
+            self._path = path
+            self._changed.notify_all()
+
+    async def _refresh_while_dirty(self) -> None:
+        while self._dirty and self._listening:
+            self._dirty = False
+            try:
+                await self._refresh()
+            except Exception as e:
+                failure = RevisionWatcherError("Failed to read the current revision")
+                failure.__cause__ = e
+                await self._fail(failure)
+                return
+
+    def _on_notification(self, *args: Any) -> None:
+        # the history is re-read instead of trusting the payload so that down
+        # migrations and phases are accounted for, a burst of notifications
+        # arriving while a refresh is running only causes one more refresh
+        if not self._listening:
+            return
+        self._dirty = True
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh_while_dirty())
+
+    async def start(self) -> None:
+        self._listening = True
+        self._failure = None
+        self._terminated = False
+        self.connection.add_termination_listener(self._on_termination)  # type: ignore
+        await self.connection.add_listener(self.channel, self._on_notification)  # type: ignore
+        # read the revision after listening so that no change can be missed
+        self._on_notification()
+        assert self._refreshing is not None
+        await self._refreshing
+        self._check()
+
+    async def stop(self) -> None:
+        # the connection can only run one query at a time
+        self._listening = False
+        if self._refreshing is not None:
+            await asyncio.gather(self._refreshing, return_exceptions=True)
+        # a closed connection (which a pool may already have taken back)
+        # has no listeners left to remove
+        if not self._terminated:
+            self.connection.remove_termination_listener(self._on_termination)  # type: ignore
+            await self.connection.remove_listener(self.channel, self._on_notification)  # type: ignore
+
+    async def __aenter__(self) -> "RevisionWatcher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    async def wait_for(self, revision: str, timeout: Optional[float] = None) -> None:
+        """Wait until the database is at `revision` or a later revision,
+        raising asyncio.TimeoutError after `timeout` seconds.
+        """
+
+        async def wait() -> None:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.reached(revision))
+
+        await asyncio.wait_for(wait(), timeout)
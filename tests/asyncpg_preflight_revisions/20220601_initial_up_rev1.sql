@@ -0,0 +1,2 @@
+CREATE TABLE people (id SERIAL PRIMARY KEY, name TEXT);
+INSERT INTO people(name) VALUES ('Obi-Wan; Kenobi');
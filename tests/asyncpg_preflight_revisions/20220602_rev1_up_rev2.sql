@@ -0,0 +1,6 @@
+ALTER TABLE people ADD COLUMN age INT;
+-- fails to parse until the column is added, but that happens above
+UPDATE people SET age = 1;
+CREATE FUNCTION people_count() RETURNS BIGINT LANGUAGE sql AS $$
+    SELECT count(*) FROM people;
+$$;
@@ -0,0 +1,7 @@
+-- budget: 60s
+SELECT people_count();
+UPDATE people
+SET nme = 'Anakin';
+CREAT TABLE pets (id INT);
+-- TODO: fill in full_name
+UPDATE people SET full_name = name;
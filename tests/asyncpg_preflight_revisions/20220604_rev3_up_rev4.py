@@ -0,0 +1,5 @@
+from typing import Any
+
+
+def run_migration(conn: Any) -> None:
+    pass
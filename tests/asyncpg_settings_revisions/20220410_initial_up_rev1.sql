@@ -0,0 +1,3 @@
+-- set: work_mem = '77MB'
+CREATE TABLE settings_seen AS
+SELECT 'rev1' AS rev, current_setting('work_mem') AS work_mem, current_setting('maintenance_work_mem') AS maintenance_work_mem;
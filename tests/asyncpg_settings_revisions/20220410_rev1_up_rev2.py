@@ -0,0 +1,9 @@
+import asyncpg  # type: ignore[import]
+
+SETTINGS = {"maintenance_work_mem": "99MB"}
+
+
+async def run_migration(conn: asyncpg.Connection) -> None:
+    await conn.execute(  # type: ignore
+        "INSERT INTO settings_seen SELECT 'rev2', current_setting('work_mem'), current_setting('maintenance_work_mem')"
+    )
@@ -0,0 +1 @@
+CREATE TABLE invoices(id SERIAL PRIMARY KEY, amount INTEGER NOT NULL);
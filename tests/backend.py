@@ -73,3 +73,48 @@ class InMemoryBackend:
             connection.execute(query)
 
         return operation
+
+
+GET_PHASE_REVISION = """\
+SELECT to_revision
+FROM migrations
+WHERE ? IS NULL OR phase IS NULL OR phase = ?
+ORDER BY rowid DESC
+LIMIT 1;
+"""
+
+
+class PhasedInMemoryBackendExecutor(InMemoryBackendExecutor):
+    async def create_table_idempotent(self) -> None:
+        await super().create_table_idempotent()
+        columns = [
+            row[1] for row in self.connection.execute("PRAGMA table_info(migrations)")
+        ]
+        if "phase" not in columns:
+            self.connection.execute("ALTER TABLE migrations ADD COLUMN phase TEXT")
+
+    async def get_current_revision(self, phase: Optional[str] = None) -> Optional[str]:
+        res = self.connection.execute(GET_PHASE_REVISION, (phase, phase)).fetchone()
+        return None if res is None else res[0]  # type: ignore[no-any-return]
+
+    async def record_migration(
+        self,
+        from_revision: Optional[str],
+        to_revision: Optional[str],
+        phase: Optional[str] = None,
+    ) -> None:
+        self.connection.execute(
+            "INSERT INTO migrations(from_revision, to_revision, phase)"
+            " VALUES (?, ?, ?)",
+            (from_revision, to_revision, phase),
+        )
+
+
+class PhasedInMemoryBackend(InMemoryBackend):
+    def connect(self) -> AsyncContextManager[PhasedInMemoryBackendExecutor]:
+        @asynccontextmanager
+        async def cm() -> AsyncIterator[PhasedInMemoryBackendExecutor]:
+            with self.connection:
+                yield PhasedInMemoryBackendExecutor(self.connection)
+
+        return cm()
@@ -0,0 +1,9 @@
+-- budget: 60s
+-- budget: 1 rows/s
+CREATE TABLE books(
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER NOT NULL REFERENCES authors(id),
+    title VARCHAR(20) NOT NULL,
+    price REAL,
+    published BOOLEAN
+);
@@ -0,0 +1,10 @@
+from typing import Any
+
+from asyncpg_trek import Budget
+
+BUDGET = Budget(seconds=0)
+
+
+async def run_migration(conn: Any) -> None:
+    await conn.execute("CREATE INDEX books_title_idx ON books(title)")
+    await conn.execute("UPDATE books SET price = price * 2")
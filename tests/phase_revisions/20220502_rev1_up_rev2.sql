@@ -0,0 +1,2 @@
+-- phase: expand
+ALTER TABLE people ADD COLUMN full_name TEXT;
@@ -0,0 +1,2 @@
+-- phase: contract
+ALTER TABLE people DROP COLUMN name;
@@ -0,0 +1,7 @@
+import sqlite3
+
+PHASE = "expand"
+
+
+async def run_migration(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE pets (id INTEGER PRIMARY KEY, owner_id INTEGER)")
@@ -0,0 +1,2 @@
+-- set: cache_size = -4096
+CREATE TABLE settings_seen AS SELECT 'rev1' AS rev, cache_size, NULL AS temp_store FROM pragma_cache_size();
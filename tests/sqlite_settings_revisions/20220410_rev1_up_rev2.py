@@ -0,0 +1,9 @@
+import aiosqlite
+
+SETTINGS = {"temp_store": 2}
+
+
+async def run_migration(conn: aiosqlite.Connection) -> None:
+    await conn.execute(
+        "INSERT INTO settings_seen SELECT 'rev2', cache_size, temp_store FROM pragma_cache_size(), pragma_temp_store()"
+    )
@@ -1,12 +1,30 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
-from typing import AsyncIterator
+from typing import AsyncIterator, Optional
 from uuid import uuid4
 
 import aiosqlite
 import pytest
 
-from asyncpg_trek import Direction, execute, plan
-from asyncpg_trek.aiosqlite import AiosqliteBackend
+from asyncpg_trek import (
+    BudgetExceeded,
+    Direction,
+    MigrationWorkerError,
+    execute,
+    get_migration_durations,
+    load_test,
+    migrate_in_subprocess,
+    plan,
+)
+from asyncpg_trek.aiosqlite import (
+    AiosqliteBackend,
+    AiosqliteProfiler,
+    AiosqliteSyntheticData,
+    migrate_fleet,
+)
 
 
 @pytest.fixture
@@ -18,6 +36,9 @@ async def db_connection(tmp_path: Path) -> AsyncIterator[aiosqlite.Connection]:
 
 
 MIGRATIONS_FOLDER_AIOSQLITE = Path(__file__).parent / "asyncpg_revisions"
+TRACK_MIGRATIONS_FOLDER = Path(__file__).parent / "asyncpg_track_revisions"
+SETTINGS_MIGRATIONS_FOLDER = Path(__file__).parent / "sqlite_settings_revisions"
+LOAD_TEST_MIGRATIONS_FOLDER = Path(__file__).parent / "load_test_revisions"
 
 
 @pytest.mark.anyio
@@ -62,3 +83,233 @@ async def test_run_migrations_failure(db_connection: aiosqlite.Connection) -> No
     async with db_connection.execute("SELECT name FROM people LIMIT 1") as c:
         record = await c.fetchone()
     assert record is None
+
+
+@pytest.mark.anyio
+async def test_profile_statements(db_connection: aiosqlite.Connection) -> None:
+    backend = AiosqliteBackend(db_connection)
+    planned = await plan(backend, MIGRATIONS_FOLDER_AIOSQLITE, "rev2", Direction.up)
+    result = await execute(backend, planned, profiler=AiosqliteProfiler())
+    create_table, python_migration = result.applied
+
+    (statement,) = create_table.statements
+    assert statement.statement.startswith("CREATE TABLE people")
+    assert statement.call_site == str(planned[0].path)
+
+    create_index, insert = python_migration.statements
+    assert create_index.statement == "CREATE INDEX name_idx ON people(name)"
+    assert insert.rows == 1
+    assert insert.call_site == f"{planned[1].path}:6"
+    assert "INSERT INTO people" in result.slow_statement_report()
+
+
+@pytest.mark.anyio
+async def test_track_has_its_own_history(db_connection: aiosqlite.Connection) -> None:
+    backend = AiosqliteBackend(db_connection)
+    planned = await plan(backend, MIGRATIONS_FOLDER_AIOSQLITE, "rev2", Direction.up)
+    await execute(backend, planned)
+
+    tracked = AiosqliteBackend(db_connection, track="billing")
+    planned = await plan(tracked, TRACK_MIGRATIONS_FOLDER, "rev1", Direction.up)
+    assert [(m.from_rev, m.to_rev) for m in planned] == [("initial", "rev1")]
+    await execute(tracked, planned)
+
+    async with db_connection.execute("SELECT to_revision FROM migrations_billing") as c:
+        assert [tuple(row) for row in await c.fetchall()] == [("rev1",)]
+
+
+@pytest.mark.anyio
+async def test_pragmas(db_connection: aiosqlite.Connection) -> None:
+    async with db_connection.execute("PRAGMA cache_size") as c:
+        (default_cache_size,) = await c.fetchone()  # type: ignore
+    backend = AiosqliteBackend(db_connection, pragmas={"cache_size": "-8192"})
+    planned = await plan(backend, SETTINGS_MIGRATIONS_FOLDER, "rev2", Direction.up)
+    await execute(backend, planned)
+    async with db_connection.execute("SELECT * FROM settings_seen ORDER BY rev") as c:
+        rows = [tuple(row) for row in await c.fetchall()]
+    assert rows == [("rev1", -4096, None), ("rev2", -8192, 2)]
+    # PRAGMAs are restored after each migration
+    async with db_connection.execute("PRAGMA cache_size") as c:
+        assert tuple(await c.fetchone()) == (default_cache_size,)  # type: ignore
+
+
+@pytest.mark.anyio
+async def test_load_test(db_connection: aiosqlite.Connection) -> None:
+    backend = AiosqliteBackend(db_connection)
+    with pytest.raises(BudgetExceeded) as exc_info:
+        await load_test(
+            backend, LOAD_TEST_MIGRATIONS_FOLDER, "rev3", AiosqliteSyntheticData(), 500
+        )
+    results = exc_info.value.results
+    # only rev3 touches a table that existed when data was generated
+    assert [(r.migration.to_rev, r.rows) for r in results] == [
+        ("rev1", 0),
+        ("rev2", 0),
+        ("rev3", 500),
+    ]
+    # only the migration with a zero second budget went over
+    assert [bool(r.violations()) for r in results] == [False, False, True]
+    assert "rev2 -> rev3 took" in str(exc_info.value)
+
+    async with db_connection.execute(
+        "SELECT count(*) FROM books JOIN authors ON authors.id = books.author_id"
+    ) as c:
+        assert tuple(await c.fetchone()) == (500,)  # type: ignore
+
+
+@pytest.mark.anyio
+async def test_synthetic_data_skips_bookkeeping_tables(
+    db_connection: aiosqlite.Connection,
+) -> None:
+    backend = AiosqliteBackend(db_connection, track="billing")
+    planned = await plan(backend, MIGRATIONS_FOLDER_AIOSQLITE, "rev1", Direction.up)
+    await execute(backend, planned)
+    await db_connection.execute("CREATE TABLE migrations_log (message TEXT)")
+    data = AiosqliteSyntheticData(bookkeeping_tables={"migrations_billing"})
+    populated = await data.populate(db_connection, 10)
+    # user tables that merely look like bookkeeping tables are filled too
+    assert populated == {"people": 10, "migrations_log": 10}
+
+
+@pytest.mark.anyio
+async def test_recorded_durations(db_connection: aiosqlite.Connection) -> None:
+    # tables created before durations were recorded are upgraded in place
+    await db_connection.execute(
+        "CREATE TABLE migrations (id SERIAL PRIMARY KEY, from_revision TEXT,"
+        " to_revision TEXT, timestamp TIMESTAMP NOT NULL DEFAULT current_timestamp)"
+    )
+    backend = AiosqliteBackend(db_connection)
+    planned = await plan(backend, MIGRATIONS_FOLDER_AIOSQLITE, "rev3", Direction.up)
+    await execute(backend, planned)
+    durations = await get_migration_durations(backend)
+    assert set(durations) == {(m.from_rev, m.to_rev) for m in planned}
+
+    # durations recorded in one database are used as estimates for another
+    async with aiosqlite.connect(":memory:") as other:
+        backend = AiosqliteBackend(other)
+        planned = await plan(backend, MIGRATIONS_FOLDER_AIOSQLITE, "rev3", Direction.up)
+        result = await execute(backend, planned, time_budget=0, estimates=durations)
+        assert result.applied == []
+        assert result.revision == "initial"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("processes", [None, 2])
+async def test_migrate_fleet(tmp_path: Path, processes: Optional[int]) -> None:
+    databases = [tmp_path / f"{i}.sqlite" for i in range(10)]
+    # already up to date
+    async with aiosqlite.connect(databases[0]) as conn:
+        backend = AiosqliteBackend(conn)
+        planned = await plan(backend, MIGRATIONS_FOLDER_AIOSQLITE, "rev3", Direction.up)
+        await execute(backend, planned)
+        await conn.commit()
+    # part of the way there
+    async with aiosqlite.connect(databases[1]) as conn:
+        backend = AiosqliteBackend(conn)
+        planned = await plan(backend, MIGRATIONS_FOLDER_AIOSQLITE, "rev1", Direction.up)
+        await execute(backend, planned)
+        await conn.commit()
+    databases[2].write_text("not a database")
+
+    result = await migrate_fleet(
+        databases,
+        MIGRATIONS_FOLDER_AIOSQLITE,
+        "rev3",
+        concurrency=3,
+        processes=processes,
+    )
+
+    assert list(result.skipped) == [str(databases[0])]
+    assert list(result.failures) == [str(databases[2])]
+    assert "file is not a database" in result.failures[str(databases[2])]
+    assert result.migrated == {
+        str(path): "rev1" if path == databases[1] else "initial"
+        for path in databases[1:]
+        if path != databases[2]
+    }
+    for path in result.migrated:
+        async with aiosqlite.connect(path) as conn:
+            backend = AiosqliteBackend(conn)
+            async with backend.connect() as exec:
+                assert await exec.get_current_revision() == "rev3"
+
+
+@asynccontextmanager
+async def open_backend(
+    path: Path, delay: float = 0, commit_delay: float = 0
+) -> AsyncIterator[AiosqliteBackend]:
+    # runs in the worker process of migrate_in_subprocess()
+    await asyncio.sleep(delay)
+    async with aiosqlite.connect(path) as conn:
+        yield AiosqliteBackend(conn)
+        await asyncio.sleep(commit_delay)
+        await conn.commit()
+
+
+@pytest.mark.anyio
+async def test_migrate_in_subprocess(tmp_path: Path) -> None:
+    path = tmp_path / "db.sqlite"
+    events = [
+        (e.kind, e.to_rev)
+        async for e in migrate_in_subprocess(
+            partial(open_backend, path), MIGRATIONS_FOLDER_AIOSQLITE, "rev3"
+        )
+    ]
+    assert events == [
+        ("planned", None),
+        ("started", "rev1"),
+        ("finished", "rev1"),
+        ("started", "rev2"),
+        ("finished", "rev2"),
+        ("started", "rev3"),
+        ("finished", "rev3"),
+        ("completed", None),
+    ]
+    async with aiosqlite.connect(path) as conn:
+        async with AiosqliteBackend(conn).connect() as exec:
+            assert await exec.get_current_revision() == "rev3"
+
+
+@pytest.mark.anyio
+async def test_migrate_in_subprocess_waits_for_factory(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    path = tmp_path / "db.sqlite"
+    async for event in migrate_in_subprocess(
+        partial(open_backend, path, commit_delay=0.3),
+        MIGRATIONS_FOLDER_AIOSQLITE,
+        "rev3",
+    ):
+        pass
+    assert event.kind == "completed"
+    assert "Terminating migration worker" not in caplog.text
+    async with aiosqlite.connect(path) as conn:
+        async with AiosqliteBackend(conn).connect() as exec:
+            assert await exec.get_current_revision() == "rev3"
+
+
+@pytest.mark.anyio
+async def test_migrate_in_subprocess_failure(tmp_path: Path) -> None:
+    kinds = []
+    with pytest.raises(MigrationWorkerError, match="no such table: undefined_table"):
+        async for event in migrate_in_subprocess(
+            partial(open_backend, tmp_path / "db.sqlite"),
+            MIGRATIONS_FOLDER_AIOSQLITE,
+            "rev4bad",
+        ):
+            kinds.append(event.kind)
+    assert kinds[-1] == "started"
+
+
+@pytest.mark.anyio
+async def test_migrate_in_subprocess_timeout(tmp_path: Path) -> None:
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        async for _ in migrate_in_subprocess(
+            partial(open_backend, tmp_path / "db.sqlite", delay=60),
+            MIGRATIONS_FOLDER_AIOSQLITE,
+            "rev3",
+            timeout=0.5,
+        ):
+            pass
+    assert time.monotonic() - start < 30
@@ -1,12 +1,38 @@
+import asyncio
+import time
 from pathlib import Path
-from typing import AsyncIterator
+from typing import AsyncIterator, List
 from uuid import uuid4
 
 import asyncpg  # type: ignore[import]
 import pytest
 
-from asyncpg_trek import Direction, execute, plan
-from asyncpg_trek.asyncpg import AsyncpgBackend
+from asyncpg_trek import (
+    BudgetExceeded,
+    Direction,
+    Phase,
+    Track,
+    execute,
+    get_migration_durations,
+    load_test,
+    migrate_tracks,
+    plan,
+)
+from asyncpg_trek.asyncpg import (
+    AsyncpgAnalyzer,
+    AsyncpgBackend,
+    AsyncpgProfiler,
+    AsyncpgProgressMonitor,
+    AsyncpgSyntheticData,
+    PreflightError,
+    ProgressReport,
+    ReplicationGovernor,
+    RevisionWatcher,
+    RevisionWatcherError,
+    preflight,
+)
+from asyncpg_trek.asyncpg._preflight import _defined_earlier
+from asyncpg_trek.asyncpg._watcher import _revision_path
 
 
 @pytest.fixture
@@ -26,9 +52,9 @@ async def admin_connection() -> AsyncIterator[asyncpg.Connection]:
 
 @pytest.fixture
 @pytest.mark.anyio
-async def db_connection(
+async def db_pool(
     admin_connection: asyncpg.Connection,
-) -> AsyncIterator[asyncpg.Connection]:
+) -> AsyncIterator[asyncpg.Pool]:
     db_name = f'tmp_{str(uuid4()).replace("-", "_")}'
     await admin_connection.execute(f"CREATE DATABASE {db_name}")  # type: ignore
     try:
@@ -39,14 +65,27 @@ async def db_connection(
             password="postgres",
             database=db_name,
         ) as pool:
-            conn: asyncpg.Connection
-            async with pool.acquire() as conn:  # type: ignore
-                yield conn
+            yield pool
     finally:
         await admin_connection.execute(f"DROP DATABASE {db_name}")  # type: ignore
 
 
+@pytest.fixture
+@pytest.mark.anyio
+async def db_connection(
+    db_pool: asyncpg.Pool,
+) -> AsyncIterator[asyncpg.Connection]:
+    conn: asyncpg.Connection
+    async with db_pool.acquire() as conn:  # type: ignore
+        yield conn
+
+
 MIGRATIONS_FOLDER = Path(__file__).parent / "asyncpg_revisions"
+TRACK_MIGRATIONS_FOLDER = Path(__file__).parent / "asyncpg_track_revisions"
+PHASE_MIGRATIONS_FOLDER = Path(__file__).parent / "phase_revisions"
+SETTINGS_MIGRATIONS_FOLDER = Path(__file__).parent / "asyncpg_settings_revisions"
+LOAD_TEST_MIGRATIONS_FOLDER = Path(__file__).parent / "load_test_revisions"
+PREFLIGHT_MIGRATIONS_FOLDER = Path(__file__).parent / "asyncpg_preflight_revisions"
 
 
 @pytest.mark.parametrize("schema", [None, "custom"])
@@ -89,3 +128,418 @@ async def test_run_migrations_failure(
     # the changes should be reverted because migrations are run in a transaction
     record = await db_connection.fetchrow("SELECT name FROM people LIMIT 1")  # type: ignore
     assert record is None
+
+
+@pytest.mark.anyio
+async def test_replication_governor_no_thresholds(
+    db_connection: asyncpg.Connection,
+) -> None:
+    backend = AsyncpgBackend(db_connection)
+    governor = ReplicationGovernor()
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev2", Direction.up)
+    result = await execute(backend, planned, governor=governor)
+    assert result.throttled == 0
+    # there are no replicas attached to the test database
+    sample = await governor.sample(db_connection)
+    assert sample.replay_lag is None
+    assert sample.wal_rate is not None
+
+
+@pytest.mark.anyio
+async def test_replication_governor_wal_rate(
+    db_connection: asyncpg.Connection,
+) -> None:
+    backend = AsyncpgBackend(db_connection)
+    # any WAL at all exceeds this rate, so every migration after the first waits
+    # until a poll interval passes without WAL being generated
+    governor = ReplicationGovernor(max_wal_rate=0, poll_interval=0.01)
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev2", Direction.up)
+    result = await execute(backend, planned, governor=governor)
+    first, second = result.applied
+    assert first.throttled == 0
+    assert second.throttled >= 0.01
+    assert governor.throttled == result.throttled
+
+
+@pytest.mark.anyio
+async def test_replication_governor_max_wait(
+    db_connection: asyncpg.Connection,
+) -> None:
+    governor = ReplicationGovernor(max_wal_rate=0, poll_interval=60, max_wait=0)
+    await governor.sample(db_connection)
+    await db_connection.execute("CREATE TABLE wal_generator AS SELECT 1 AS n")  # type: ignore
+    # gives up straight away instead of sleeping for a poll interval
+    assert await governor.throttle(db_connection) == 0
+
+
+@pytest.mark.anyio
+async def test_profile_statements(db_connection: asyncpg.Connection) -> None:
+    backend = AsyncpgBackend(db_connection)
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev2", Direction.up)
+    # explain everything that can be explained
+    profiler = AsyncpgProfiler(explain_threshold=0)
+    result = await execute(backend, planned, profiler=profiler)
+    create_table, python_migration = result.applied
+
+    (statement,) = create_table.statements
+    assert statement.rows is None
+    assert statement.plan is None
+    assert statement.call_site == str(planned[0].path)
+
+    create_index, insert = python_migration.statements
+    assert create_index.plan is None
+    assert insert.rows == 1
+    assert insert.call_site == f"{planned[1].path}:6"
+    assert insert.plan is not None and "Insert on people" in insert.plan
+    assert "Insert on people" in result.slow_statement_report()
+
+    # the statement was explained from a savepoint and only applied once
+    count = await db_connection.fetchval("SELECT count(*) FROM people")  # type: ignore
+    assert count == 1
+
+
+@pytest.mark.anyio
+async def test_tracks(db_pool: asyncpg.Pool) -> None:
+    async with db_pool.acquire() as conn1, db_pool.acquire() as conn2:  # type: ignore
+        result = await migrate_tracks(
+            [
+                Track(
+                    "core",
+                    AsyncpgBackend(conn1, track="core"),
+                    MIGRATIONS_FOLDER,
+                    "rev2",
+                ),
+                Track(
+                    "billing",
+                    AsyncpgBackend(conn2, track="billing"),
+                    TRACK_MIGRATIONS_FOLDER,
+                    "rev1",
+                ),
+            ]
+        )
+    assert result.failures == {}
+    assert set(result.results) == {"core", "billing"}
+    assert await db_pool.fetchval("SELECT to_revision FROM migrations_core ORDER BY id DESC") == "rev2"  # type: ignore
+    assert await db_pool.fetchval("SELECT to_revision FROM migrations_billing") == "rev1"  # type: ignore
+    assert await db_pool.fetchval("SELECT count(*) FROM invoices") == 0  # type: ignore
+
+
+@pytest.mark.anyio
+async def test_settings(db_connection: asyncpg.Connection) -> None:
+    backend = AsyncpgBackend(db_connection, settings={"work_mem": "11MB"})
+    planned = await plan(backend, SETTINGS_MIGRATIONS_FOLDER, "rev2", Direction.up)
+    await execute(backend, planned)
+    rows = await db_connection.fetch("SELECT * FROM settings_seen ORDER BY rev")  # type: ignore
+    assert [tuple(row) for row in rows] == [
+        ("rev1", "77MB", "64MB"),
+        ("rev2", "11MB", "99MB"),
+    ]
+    # settings don't leak out of the migrations
+    assert await db_connection.fetchval("SHOW work_mem") == "4MB"  # type: ignore
+
+
+@pytest.mark.anyio
+async def test_load_test(db_connection: asyncpg.Connection) -> None:
+    backend = AsyncpgBackend(db_connection)
+    with pytest.raises(BudgetExceeded) as exc_info:
+        await load_test(
+            backend, LOAD_TEST_MIGRATIONS_FOLDER, "rev3", AsyncpgSyntheticData(), 500
+        )
+    results = exc_info.value.results
+    # only rev3 touches a table that existed when data was generated
+    assert [(r.migration.to_rev, r.rows) for r in results] == [
+        ("rev1", 0),
+        ("rev2", 0),
+        ("rev3", 500),
+    ]
+    assert [bool(r.violations()) for r in results] == [False, False, True]
+
+    count = await db_connection.fetchval(  # type: ignore
+        "SELECT count(*) FROM books JOIN authors ON authors.id = books.author_id"
+    )
+    assert count == 500
+
+
+@pytest.mark.anyio
+async def test_recorded_durations(db_connection: asyncpg.Connection) -> None:
+    # tables created before durations were recorded are upgraded in place
+    await db_connection.execute(  # type: ignore
+        "CREATE TABLE migrations (id SERIAL PRIMARY KEY, from_revision TEXT,"
+        " to_revision TEXT, timestamp TIMESTAMP NOT NULL DEFAULT current_timestamp)"
+    )
+    backend = AsyncpgBackend(db_connection)
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    result = await execute(backend, planned, time_budget=3600)
+    assert result.complete
+    durations = await get_migration_durations(backend)
+    assert durations == {
+        (r.migration.from_rev, r.migration.to_rev): pytest.approx(r.elapsed, abs=0.1)
+        for r in result.applied
+    }
+
+
+@pytest.mark.anyio
+async def test_preflight(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    backend = AsyncpgBackend(db_connection)
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    await preflight(planned, db_pool)
+
+    planned = await plan(backend, PREFLIGHT_MIGRATIONS_FOLDER, "rev1", Direction.up)
+    await preflight(planned, db_pool)
+    await execute(backend, planned)
+
+    planned = await plan(backend, PREFLIGHT_MIGRATIONS_FOLDER, "rev4", Direction.up)
+    with pytest.raises(PreflightError) as exc_info:
+        await preflight(planned, db_pool)
+    issues = [(i.path.name, i.line) for i in exc_info.value.issues]
+    assert issues == [
+        ("20220603_rev2_up_rev3.sql", 4),
+        ("20220603_rev2_up_rev3.sql", 5),
+        # only mentioned in a comment
+        ("20220603_rev2_up_rev3.sql", 7),
+        ("20220604_rev3_up_rev4.py", 4),
+    ]
+    assert 'column "nme" of relation "people" does not exist' in str(exc_info.value)
+    assert 'syntax error at or near "CREAT"' in str(exc_info.value)
+    # nothing was run
+    assert await db_connection.fetchval("SELECT to_regproc('people_count')") is None  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "preceding, expected",
+    [
+        ("ALTER TABLE people ADD COLUMN age INT;", True),
+        ("ALTER TABLE people ADD age INT;", True),
+        ("ALTER TABLE people RENAME COLUMN years TO age;", True),
+        ('CREATE TABLE IF NOT EXISTS public."people" (id INT);', True),
+        ("-- TODO: ALTER TABLE people ADD COLUMN age INT", False),
+        ("/* age */ SELECT age FROM other_people;", False),
+        ("ALTER TABLE people ADD COLUMN ages INT;", False),
+    ],
+)
+def test_preflight_defined_earlier(preceding: str, expected: bool) -> None:
+    error = asyncpg.UndefinedColumnError(
+        'column "age" of relation "people" does not exist'
+    )
+    assert _defined_earlier(error, preceding) is expected
+
+
+@pytest.mark.anyio
+async def test_analyze_after_execute(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    backend = AsyncpgBackend(db_connection)
+    analyzer = AsyncpgAnalyzer(db_pool, prewarm=True)
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev2", Direction.up)
+    await execute(backend, planned, post_execute=analyzer)
+    assert analyzer.analyzed == ["public.people"]
+    # pg_prewarm is not installed
+    assert analyzer.prewarmed == []
+    reltuples = await db_connection.fetchval(  # type: ignore
+        "SELECT reltuples FROM pg_class WHERE oid = 'people'::regclass"
+    )
+    assert reltuples == 1
+
+    analyzer = AsyncpgAnalyzer(db_pool, time_budget=0)
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    await execute(backend, planned, post_execute=analyzer)
+    assert analyzer.analyzed == []
+    assert analyzer.skipped == ["public.people"]
+
+    # failures after the plan committed are logged and skipped
+    analyzer = AsyncpgAnalyzer(db_pool)
+    analyzer._tables = ["public.missing", "public.people"]
+    await analyzer.after_commit()
+    assert analyzer.analyzed == ["public.people"]
+    assert analyzer.skipped == ["public.missing"]
+
+
+def test_progress_eta_per_relation() -> None:
+    monitor = AsyncpgProgressMonitor(None, print)
+    first = ("CREATE INDEX", "16384/16390", "building index")
+    assert monitor._eta(first, 10, 100) is None
+    monitor._phase_start[first] = (time.monotonic() - 1, 10)
+    assert monitor._eta(first, 20, 100) == pytest.approx(8, rel=0.1)
+    # another index build on another table starts from scratch
+    second = ("CREATE INDEX", "16400/16410", "building index")
+    assert monitor._eta(second, 50, 100) is None
+    # and so does one that can't be told apart from the previous one
+    assert monitor._eta(first, 5, 100) is None
+    assert monitor._phase_start[first][1] == 5
+
+
+@pytest.mark.anyio
+async def test_progress_monitor_create_index(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    reports: List[ProgressReport] = []
+    monitor = AsyncpgProgressMonitor(db_pool, reports.append, interval=0.005)
+    await db_connection.execute(  # type: ignore
+        "CREATE TABLE big AS"
+        " SELECT md5(n::text) AS s FROM generate_series(1, 300000) AS g(n)"
+    )
+    async with monitor.watch(db_connection):
+        await db_connection.execute("CREATE INDEX big_s_idx ON big(s)")  # type: ignore
+    assert any(
+        r.command == "CREATE INDEX" and r.phase and r.percent is not None
+        for r in reports
+    )
+    assert {r.pid for r in reports} == {db_connection.get_server_pid()}
+
+
+@pytest.mark.anyio
+async def test_progress_monitor_survives_errors(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    reports: List[ProgressReport] = []
+    polls = 0
+
+    async def poll(conn: asyncpg.Connection, pid: int) -> ProgressReport:
+        nonlocal polls
+        polls += 1
+        if polls == 1:
+            raise ConnectionError("transient")
+        return ProgressReport(pid, "CREATE INDEX", "building index")
+
+    def callback(report: ProgressReport) -> None:
+        if polls == 2:
+            raise RuntimeError("callback failed")
+        reports.append(report)
+
+    monitor = AsyncpgProgressMonitor(db_pool, callback, interval=0.005)
+    monitor.poll = poll  # type: ignore[assignment]
+    async with monitor.watch(db_connection):
+        await asyncio.sleep(0.2)
+    assert polls > 3
+    assert reports
+
+
+@pytest.mark.anyio
+async def test_progress_monitor_lock_wait(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    backend = AsyncpgBackend(db_connection)
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev1", Direction.up)
+    await execute(backend, planned)
+
+    reports: List[ProgressReport] = []
+    monitor = AsyncpgProgressMonitor(db_pool, reports.append, interval=0.01)
+    holder: asyncpg.Connection
+    async with db_pool.acquire() as holder:  # type: ignore
+        lock = holder.transaction()
+        await lock.start()
+        holder_pid = holder.get_server_pid()
+        await holder.execute("LOCK TABLE people IN ACCESS EXCLUSIVE MODE")  # type: ignore
+        planned = await plan(backend, MIGRATIONS_FOLDER, "rev2", Direction.up)
+        async with monitor.watch(db_connection):
+            migration = asyncio.ensure_future(execute(backend, planned))
+            await asyncio.sleep(0.5)
+            await lock.rollback()
+            await migration
+    assert reports
+    assert reports[0].lock == "relation"
+    assert list(reports[0].blocked_by) == [holder_pid]
+
+
+@pytest.mark.anyio
+async def test_revision_watcher(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    backend = AsyncpgBackend(db_connection)
+    listener: asyncpg.Connection
+    async with db_pool.acquire() as listener:  # type: ignore
+        async with RevisionWatcher(listener) as watcher:
+            assert watcher.revision is None
+            assert watcher.reached("initial")
+            with pytest.raises(asyncio.TimeoutError):
+                await watcher.wait_for("rev1", timeout=0.1)
+
+            waiter = asyncio.ensure_future(watcher.wait_for("rev2", timeout=5))
+            planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+            await execute(backend, planned)
+            await waiter
+            # every notification is handled by now
+            await watcher.wait_for("rev3", timeout=5)
+            assert watcher.revision == "rev3"
+            assert watcher.reached("rev1")
+            assert not watcher.reached("rev4bad")
+
+
+@pytest.mark.anyio
+async def test_revision_watcher_coalesces_notifications(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    listener: asyncpg.Connection
+    async with db_pool.acquire() as listener:  # type: ignore
+        async with RevisionWatcher(listener) as watcher:
+            refreshes = 0
+            refresh = watcher._refresh
+
+            async def counting_refresh() -> None:
+                nonlocal refreshes
+                refreshes += 1
+                await refresh()
+
+            watcher._refresh = counting_refresh  # type: ignore[assignment]
+            await db_connection.execute(  # type: ignore
+                "SELECT pg_notify($1, n::text) FROM generate_series(1, 50) AS g(n)",
+                watcher.channel,
+            )
+            await asyncio.sleep(0.2)
+            assert 1 <= refreshes <= 2
+            assert watcher.revision is None
+
+
+@pytest.mark.anyio
+async def test_revision_watcher_phases(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    backend = AsyncpgBackend(db_connection)
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev3", Direction.up, phase=Phase.expand
+    )
+    await execute(backend, planned)
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev1", Direction.up, phase=Phase.contract
+    )
+    await execute(backend, planned)
+    listener: asyncpg.Connection
+    async with db_pool.acquire() as listener:  # type: ignore
+        async with RevisionWatcher(listener) as watcher:
+            assert watcher.revision == "rev1"
+        async with RevisionWatcher(listener, phase=Phase.expand) as watcher:
+            assert watcher.revision == "rev3"
+
+
+@pytest.mark.anyio
+async def test_revision_watcher_connection_lost(
+    db_pool: asyncpg.Pool, db_connection: asyncpg.Connection
+) -> None:
+    listener: asyncpg.Connection
+    async with db_pool.acquire() as listener:  # type: ignore
+        async with RevisionWatcher(listener) as watcher:
+            waiter = asyncio.ensure_future(watcher.wait_for("rev1", timeout=5))
+            await db_connection.execute(  # type: ignore
+                "SELECT pg_terminate_backend($1)", listener.get_server_pid()
+            )
+            with pytest.raises(RevisionWatcherError):
+                await waiter
+            with pytest.raises(RevisionWatcherError):
+                watcher.reached("rev1")
+            with pytest.raises(RevisionWatcherError):
+                watcher.revision
+
+
+def test_revision_path() -> None:
+    history = [
+        ("initial", "rev1"),
+        ("rev1", "rev2"),
+        ("rev2", "rev1"),
+        ("rev1", "rev3"),
+    ]
+    assert _revision_path(history) == ["initial", "rev1", "rev3"]
+    assert _revision_path(history + [("rev3", "rev1"), ("rev1", "initial")]) == [
+        "initial"
+    ]
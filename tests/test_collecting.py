@@ -5,7 +5,7 @@ from typing import Any, Collection, List
 import pytest
 
 from asyncpg_trek._collect import collect_migrations_from_filesystem
-from asyncpg_trek._types import Direction, Migration
+from asyncpg_trek._types import Budget, Direction, Migration
 from tests.backend import InMemoryBackend
 
 
@@ -51,3 +51,28 @@ def test_collect_no_revisions() -> None:
         collect_migrations_from_filesystem(
             pathlib.Path(__file__).parent / "revisions_no_revisions", backend
         )
+
+
+def test_collect_settings() -> None:
+    backend = InMemoryBackend()
+    migrations = collect_migrations_from_filesystem(
+        pathlib.Path(__file__).parent / "asyncpg_settings_revisions", backend
+    )
+    settings = {m.to_rev: m.settings for m in migrations}
+    assert settings == {
+        "rev1": {"work_mem": "77MB"},
+        "rev2": {"maintenance_work_mem": "99MB"},
+    }
+
+
+def test_collect_budgets() -> None:
+    backend = InMemoryBackend()
+    migrations = collect_migrations_from_filesystem(
+        pathlib.Path(__file__).parent / "load_test_revisions", backend
+    )
+    budgets = {m.to_rev: m.budget for m in migrations}
+    assert budgets == {
+        "rev1": None,
+        "rev2": Budget(seconds=60, rows_per_second=1),
+        "rev3": Budget(seconds=0),
+    }
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import pathlib
+import shutil
+
+import pytest
+
+from asyncpg_trek import Direction, MigrationRepository, execute, plan
+from tests.backend import InMemoryBackend
+
+REVISIONS = pathlib.Path(__file__).parent / "sqlite_revisions"
+
+
+@pytest.fixture
+def revisions(tmp_path: pathlib.Path) -> pathlib.Path:
+    directory = tmp_path / "revisions"
+    shutil.copytree(REVISIONS, directory)
+    return directory
+
+
+def test_refresh_only_reloads_changed_files(revisions: pathlib.Path) -> None:
+    repo = MigrationRepository(revisions, InMemoryBackend())
+    before = {(m.from_rev, m.to_rev, m.direction): m for m in repo.migrations()}
+    assert len(before) == 8
+    assert repo.refresh() is False
+
+    # touching a file without changing it does not reload it
+    path = revisions / "20220413_rev3_up_rev4.py"
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert repo.refresh() is False
+
+    path.write_text(
+        "async def run_migration(conn):\n"
+        "    conn.execute(\"INSERT INTO people(name) VALUES ('Leia')\")\n"
+    )
+    (revisions / "20220414_rev5_up_rev6.sql").write_text("DELETE FROM people;")
+    (revisions / "20220412_rev2_down_rev1.sql").unlink()
+    assert repo.refresh() is True
+
+    after = {(m.from_rev, m.to_rev, m.direction): m for m in repo.migrations()}
+    assert set(after) - set(before) == {("rev5", "rev6", Direction.up)}
+    assert set(before) - set(after) == {("rev2", "rev1", Direction.down)}
+    changed = ("rev3", "rev4", Direction.up)
+    assert after[changed] is not before[changed]
+    unchanged = ("rev4", "rev5", Direction.up)
+    assert after[unchanged] is before[unchanged]
+
+
+def test_refresh_no_initial_migration(revisions: pathlib.Path) -> None:
+    (revisions / "20220410_initial_up_rev1.sql").unlink()
+    repo = MigrationRepository(revisions, InMemoryBackend())
+    with pytest.raises(LookupError):
+        repo.refresh()
+
+
+def test_graph_is_cached(revisions: pathlib.Path) -> None:
+    repo = MigrationRepository(revisions, InMemoryBackend())
+    graph = repo.graph(Direction.up)
+    assert repo.graph(Direction.up) is graph
+    (revisions / "20220414_rev5_up_rev6.sql").write_text("DELETE FROM people;")
+    assert repo.graph(Direction.up) is not graph
+
+
+def test_snapshot_refreshes_once(revisions: pathlib.Path) -> None:
+    repo = MigrationRepository(revisions, InMemoryBackend())
+    calls = 0
+    refresh = repo.refresh
+
+    def counting_refresh() -> bool:
+        nonlocal calls
+        calls += 1
+        return refresh()
+
+    repo.refresh = counting_refresh  # type: ignore[assignment]
+    migrations, graph = repo.snapshot(Direction.up)
+    assert calls == 1
+    assert migrations
+    assert graph is repo.graph(Direction.up)
+
+
+@pytest.mark.anyio
+async def test_watch_survives_broken_files(revisions: pathlib.Path) -> None:
+    repo = MigrationRepository(revisions, InMemoryBackend(), poll_interval=3600)
+    assert len(repo.migrations()) == 8
+    task = asyncio.create_task(repo.watch(interval=0.01))
+    try:
+        path = revisions / "20220415_rev6_up_rev7.py"
+        path.write_text("def oops(:\n")
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        assert len(repo.migrations()) == 8
+
+        path.write_text("async def run_migration(conn):\n    pass\n")
+        await asyncio.sleep(0.1)
+        assert ("rev6", "rev7") in {(m.from_rev, m.to_rev) for m in repo.migrations()}
+    finally:
+        task.cancel()
+
+
+@pytest.mark.anyio
+async def test_plan_with_repository(revisions: pathlib.Path) -> None:
+    backend = InMemoryBackend()
+    repo = MigrationRepository(revisions, backend)
+    planned = await plan(backend, repo, "rev2", Direction.up)
+    assert [(m.from_rev, m.to_rev) for m in planned] == [
+        ("initial", "rev1"),
+        ("rev1", "rev2"),
+    ]
+    await execute(backend, planned)
+    planned = await plan(backend, repo, "rev5", Direction.up)
+    assert [(m.from_rev, m.to_rev) for m in planned] == [
+        ("rev2", "rev3"),
+        ("rev3", "rev4"),
+        ("rev4", "rev5"),
+    ]
@@ -0,0 +1,235 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from asyncpg_trek import (
+    Direction,
+    Phase,
+    execute,
+    get_migration_durations,
+    plan,
+    throttle,
+)
+from tests.backend import InMemoryBackend, PhasedInMemoryBackend
+
+MIGRATIONS_FOLDER = Path(__file__).parent / "sqlite_revisions"
+SETTINGS_MIGRATIONS_FOLDER = Path(__file__).parent / "sqlite_settings_revisions"
+PHASE_MIGRATIONS_FOLDER = Path(__file__).parent / "phase_revisions"
+
+
+class FakeGovernor:
+    def __init__(self, waits: List[float]) -> None:
+        self.waits = waits
+        self.connections: List[sqlite3.Connection] = []
+
+    async def throttle(self, connection: sqlite3.Connection) -> float:
+        self.connections.append(connection)
+        return self.waits.pop(0)
+
+
+@pytest.mark.anyio
+async def test_execute_results() -> None:
+    backend = InMemoryBackend()
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    result = await execute(backend, planned)
+    assert [r.migration for r in result.applied] == list(planned)
+    assert all(r.elapsed >= 0 for r in result.applied)
+    assert result.throttled == 0
+
+
+@pytest.mark.anyio
+async def test_execute_backend_without_settings(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    # InMemoryBackend doesn't implement the optional apply_settings
+    backend = InMemoryBackend()
+    planned = await plan(backend, SETTINGS_MIGRATIONS_FOLDER, "rev1", Direction.up)
+    assert planned[0].settings
+    result = await execute(backend, planned)
+    assert result.revision == "rev1"
+    assert "Ignoring the settings of initial -> rev1" in caplog.text
+
+
+@pytest.mark.anyio
+async def test_execute_with_governor() -> None:
+    backend = InMemoryBackend()
+    governor = FakeGovernor([0.0, 1.5, 0.25])
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    result = await execute(backend, planned, governor=governor)
+    assert [r.throttled for r in result.applied] == [0.0, 1.5, 0.25]
+    assert result.throttled == 1.75
+    assert governor.connections == [backend.connection] * 3
+
+
+@pytest.mark.anyio
+async def test_throttle_in_migration(tmp_path: Path) -> None:
+    (tmp_path / "20220410_initial_up_rev1.py").write_text(
+        "from asyncpg_trek import throttle\n"
+        "\n"
+        "async def run_migration(conn):\n"
+        "    conn.execute('CREATE TABLE batches(n INTEGER)')\n"
+        "    for n in range(3):\n"
+        "        conn.execute('INSERT INTO batches VALUES (?)', (n,))\n"
+        "        assert await throttle() == 0.5\n"
+    )
+    backend = InMemoryBackend()
+    governor = FakeGovernor([0.0, 0.5, 0.5, 0.5])
+    planned = await plan(backend, tmp_path, "rev1", Direction.up)
+    result = await execute(backend, planned, governor=governor)
+    assert result.throttled == 1.5
+    assert governor.connections == [backend.connection] * 4
+
+
+@pytest.mark.anyio
+async def test_throttle_without_governor() -> None:
+    assert await throttle() == 0
+
+
+@pytest.mark.anyio
+async def test_execute_time_budget() -> None:
+    backend = InMemoryBackend()
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    estimates = {(planned[1].from_rev, planned[1].to_rev): 60.0}
+    result = await execute(backend, planned, time_budget=30, estimates=estimates)
+    assert [r.migration for r in result.applied] == [planned[0]]
+    assert result.remaining == planned[1:]
+    assert result.revision == planned[0].to_rev
+    assert not result.complete
+
+    # the next window picks up where the last one stopped
+    resumed = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    assert [m.to_rev for m in resumed] == [m.to_rev for m in planned[1:]]
+    result = await execute(backend, resumed, time_budget=120, estimates=estimates)
+    assert result.complete
+    assert result.revision == "rev3"
+
+
+@pytest.mark.anyio
+async def test_execute_deadline_from_estimates() -> None:
+    # InMemoryBackend doesn't implement the optional duration recording
+    staging = InMemoryBackend()
+    planned = await plan(staging, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    await execute(staging, planned, time_budget=3600)
+    assert await get_migration_durations(staging) == {}
+    durations = {(m.from_rev, m.to_rev): 1.0 for m in planned}
+
+    backend = InMemoryBackend()
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    result = await execute(
+        backend, planned, deadline=time.time() - 1, estimates=durations
+    )
+    assert result.applied == []
+    assert result.remaining == planned
+    assert result.revision == "initial"
+
+
+def columns(backend: PhasedInMemoryBackend, table: str) -> List[str]:
+    return [row[1] for row in backend.connection.execute(f"PRAGMA table_info({table})")]
+
+
+@pytest.mark.anyio
+async def test_expand_contract_phases() -> None:
+    backend = PhasedInMemoryBackend()
+
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev4", Direction.up, phase=Phase.expand
+    )
+    assert [m.phase for m in planned] == [Phase.expand] * 4
+    assert [m.deferred for m in planned] == [False, False, True, False]
+    await execute(backend, planned)
+    # the contract migration was deferred
+    assert columns(backend, "people") == ["id", "name", "full_name"]
+    assert columns(backend, "pets") == ["id", "owner_id"]
+
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev4", Direction.up, phase=Phase.contract
+    )
+    assert [m.phase for m in planned] == [Phase.contract] * 4
+    result = await execute(backend, planned)
+    assert result.revision == "rev4"
+    assert columns(backend, "people") == ["id", "full_name"]
+
+    for phase in Phase:
+        assert not await plan(
+            backend, PHASE_MIGRATIONS_FOLDER, "rev4", Direction.up, phase=phase
+        )
+
+
+@pytest.mark.anyio
+async def test_contract_phase_cannot_pass_expand_phase() -> None:
+    backend = PhasedInMemoryBackend()
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev2", Direction.up, phase=Phase.expand
+    )
+    await execute(backend, planned)
+
+    with pytest.raises(ValueError, match="the expand phase is at rev2"):
+        await plan(
+            backend, PHASE_MIGRATIONS_FOLDER, "rev3", Direction.up, phase=Phase.contract
+        )
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev2", Direction.up, phase=Phase.contract
+    )
+    await execute(backend, planned)
+    # nothing in the contract phase up to rev2
+    assert columns(backend, "people") == ["id", "name", "full_name"]
+
+
+@pytest.mark.anyio
+async def test_plan_without_phase_once_phases_diverged() -> None:
+    backend = PhasedInMemoryBackend()
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev4", Direction.up, phase=Phase.expand
+    )
+    await execute(backend, planned)
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev2", Direction.up, phase=Phase.contract
+    )
+    await execute(backend, planned)
+
+    with pytest.raises(ValueError, match="the contract phase at rev2"):
+        await plan(backend, PHASE_MIGRATIONS_FOLDER, "rev4", Direction.up)
+    planned = await plan(
+        backend, PHASE_MIGRATIONS_FOLDER, "rev4", Direction.up, phase=Phase.contract
+    )
+    await execute(backend, planned)
+    # once the phases agree again there is a single revision
+    assert not await plan(backend, PHASE_MIGRATIONS_FOLDER, "rev4", Direction.up)
+
+
+@pytest.mark.anyio
+async def test_phases_need_backend_support() -> None:
+    with pytest.raises(TypeError, match="does not support phases"):
+        await plan(
+            InMemoryBackend(),
+            PHASE_MIGRATIONS_FOLDER,
+            "rev4",
+            Direction.up,
+            phase=Phase.expand,
+        )
+
+
+class FakePostExecute:
+    def __init__(self) -> None:
+        self.calls: List[str] = []
+
+    async def before_plan(self, connection: sqlite3.Connection) -> None:
+        self.calls.append("before_plan")
+
+    async def after_plan(self, connection: sqlite3.Connection) -> None:
+        self.calls.append("after_plan")
+
+    async def after_commit(self) -> None:
+        self.calls.append("after_commit")
+
+
+@pytest.mark.anyio
+async def test_execute_post_execute() -> None:
+    backend = InMemoryBackend()
+    post_execute = FakePostExecute()
+    planned = await plan(backend, MIGRATIONS_FOLDER, "rev3", Direction.up)
+    await execute(backend, planned, post_execute=post_execute)
+    assert post_execute.calls == ["before_plan", "after_plan", "after_commit"]
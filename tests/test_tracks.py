@@ -0,0 +1,96 @@
+import pathlib
+from typing import Any, List
+
+import aiosqlite
+import pytest
+
+from asyncpg_trek import Direction, Phase, Track, migrate_tracks, plan
+from asyncpg_trek._tracks import table_for_track
+from asyncpg_trek.aiosqlite import AiosqliteBackend
+from tests.backend import InMemoryBackend, PhasedInMemoryBackend
+
+REVISIONS = pathlib.Path(__file__).parent / "sqlite_revisions"
+NO_REVISIONS = pathlib.Path(__file__).parent / "revisions_no_revisions"
+PHASE_REVISIONS = pathlib.Path(__file__).parent / "phase_revisions"
+
+
+def make_track(name: str, directory: pathlib.Path, depends_on: List[str]) -> Any:
+    return Track(name, InMemoryBackend(), directory, "rev2", depends_on=depends_on)
+
+
+def test_table_for_track() -> None:
+    assert table_for_track(None) == "migrations"
+    assert table_for_track("billing") == "migrations_billing"
+    with pytest.raises(ValueError):
+        table_for_track('billing"; DROP TABLE people; --')
+
+
+@pytest.mark.anyio
+async def test_migrate_tracks() -> None:
+    result = await migrate_tracks(
+        [
+            make_track("app", REVISIONS, ["core", "auth"]),
+            make_track("core", REVISIONS, []),
+            make_track("auth", REVISIONS, ["core"]),
+        ]
+    )
+    assert set(result.results) == {"core", "auth", "app"}
+    assert not result.failures
+    assert not result.skipped
+
+
+@pytest.mark.anyio
+async def test_migrate_tracks_failure_only_blocks_dependents() -> None:
+    result = await migrate_tracks(
+        [
+            make_track("core", REVISIONS, []),
+            make_track("broken", NO_REVISIONS, []),
+            make_track("app", REVISIONS, ["broken"]),
+            make_track("reports", REVISIONS, ["app"]),
+        ]
+    )
+    assert set(result.results) == {"core"}
+    assert isinstance(result.failures["broken"], LookupError)
+    assert set(result.skipped) == {"app", "reports"}
+
+
+@pytest.mark.anyio
+async def test_migrate_tracks_invalid_dependencies() -> None:
+    with pytest.raises(ValueError, match="Cyclic"):
+        await migrate_tracks(
+            [make_track("a", REVISIONS, ["b"]), make_track("b", REVISIONS, ["a"])]
+        )
+    with pytest.raises(LookupError):
+        await migrate_tracks([make_track("a", REVISIONS, ["missing"])])
+
+
+@pytest.mark.anyio
+async def test_migrate_tracks_backend_must_match_track() -> None:
+    async with aiosqlite.connect(":memory:") as conn:
+        with pytest.raises(ValueError, match="migrations_billing"):
+            await migrate_tracks(
+                [Track("billing", AiosqliteBackend(conn), REVISIONS, "rev2")]
+            )
+        result = await migrate_tracks(
+            [
+                Track(
+                    "billing",
+                    AiosqliteBackend(conn, track="billing"),
+                    REVISIONS,
+                    "rev2",
+                )
+            ]
+        )
+        assert set(result.results) == {"billing"}
+
+
+@pytest.mark.anyio
+async def test_migrate_tracks_phase() -> None:
+    backend = PhasedInMemoryBackend()
+    result = await migrate_tracks(
+        [Track("app", backend, PHASE_REVISIONS, "rev4", phase=Phase.expand)]
+    )
+    assert all(r.migration.phase is Phase.expand for r in result.results["app"].applied)
+    # the contract phase hasn't run yet
+    with pytest.raises(ValueError, match="a phase must be given"):
+        await plan(backend, PHASE_REVISIONS, "rev4", Direction.up)